@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Streaming endpoints (job progress as Server-Sent Events, see
+cards/progress.py) need this entry point, e.g.:
+
+    uvicorn _core.asgi:application
 """
 
 import os
@@ -73,6 +73,10 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # templates/templatetags no está dentro de ninguna app
+            'libraries': {
+                'mtg_extras': 'templates.templatetags.mtg_extras',
+            },
         },
     },
 ]
@@ -131,6 +135,11 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Cards: ficheros generados (índices, cachés)
+CARDS_DATA_DIR = Path(os.getenv('CARDS_DATA_DIR', BASE_DIR / 'data'))
+# Límite de disco de la caché de imágenes (CARDS_DATA_DIR/images), en MB
+CARDS_IMAGE_CACHE_MB = int(os.getenv('CARDS_IMAGE_CACHE_MB', 2048))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
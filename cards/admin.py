@@ -1,6 +1,60 @@
 # admin.py
 from django.contrib import admin
-from .models import Card, Deck, CardInDeck
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from .history import record_revision
+from .models import Card, CardImage, Deck, CardInDeck, DeckRevision, InventoryItem, Job, identity_key
+
+
+# Por debajo de este tamaño un COUNT exacto es barato y se usa siempre
+ESTIMATED_COUNT_THRESHOLD = 10_000
+
+
+def estimate_row_count(model):
+    """
+    Returns a cheap estimate of the number of rows in the model's table,
+    or None if the backend offers nothing better than a full COUNT.
+
+    - PostgreSQL: planner statistics (pg_class.reltuples).
+    - MySQL: information_schema TABLE_ROWS.
+    - Others (SQLite): None. SQLite keeps no row count, and MAX(pk) overstates
+      it after bulk deletes; its COUNT(*) scans the smallest index, which
+      stays well under 100ms at a million rows.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            row = cursor.fetchone()
+            # -1 = tabla nunca analizada
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table])
+            row = cursor.fetchone()
+            return row[0] if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses estimate_row_count() for unfiltered querysets of
+    large tables instead of a full COUNT(*). Filtered querysets (search,
+    list_filter) keep the exact count.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and not qs.query.where:
+            estimate = estimate_row_count(qs.model)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
 
 
 class CardAdmin(admin.ModelAdmin):
@@ -11,12 +65,12 @@ class CardAdmin(admin.ModelAdmin):
     fieldsets = (
         (None,
          {'fields':
-             ('name', 'mana_cost')
+             ('name', 'set', 'mana_cost')
           }
          ),
         ('Types',
          {'fields':
-             ('type', 'subtypes')
+             ('type', 'subtypes', 'rarity')
           }
          ),
         ('Description',
@@ -33,6 +87,23 @@ class CardAdmin(admin.ModelAdmin):
          ),
     )
     readonly_fields = ('created_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # evita el segundo COUNT(*) al buscar
+
+    def get_search_results(self, request, queryset, search_term):
+        # El selector de cartas (autocomplete) busca por prefijo de name_key
+        # (índice de card_unique_printing) en vez de icontains sobre cuatro
+        # campos. name_key lo calcula Python, así que 'æther' encuentra 'Æther Vial'.
+        match = request.resolver_match
+        if match is None or match.url_name != 'autocomplete':
+            return super().get_search_results(request, queryset, search_term)
+
+        term = identity_key(search_term, None)[0]
+        if not term:
+            return queryset, False
+        queryset = queryset.filter(name_key__gte=term, name_key__lt=term + '\uffff')
+        # mismo orden que el índice: el range scan ya sale ordenado
+        return queryset.order_by('name_key', 'set'), False
 
 
 class CardInDeckInline(admin.TabularInline):
@@ -42,11 +113,23 @@ class CardInDeckInline(admin.TabularInline):
     fields = ('card', 'quantity')   # <- aquí editas cantidad
 
 
+class DeckRevisionInline(admin.TabularInline):
+    model = DeckRevision            # historial de solo lectura
+    extra = 0
+    can_delete = False
+    fields = ('number', 'is_checkpoint', 'created_at')
+    readonly_fields = fields
+    ordering = ('-number',)
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class DeckAdmin(admin.ModelAdmin):   # (puedes renombrar desde DecksAdmin a DeckAdmin)
     list_display = ('title', 'format', 'created_at', 'updated_at')
     search_fields = ('title', 'format')
     ordering = ('-created_at',)
-    inlines = [CardInDeckInline]
+    inlines = [CardInDeckInline, DeckRevisionInline]
     exclude = ('cards',)            # evita el widget M2M cuando usas Inline
     fieldsets = (
         (None, {'fields': ('title', 'format', 'description')}),
@@ -54,7 +137,41 @@ class DeckAdmin(admin.ModelAdmin):   # (puedes renombrar desde DecksAdmin a Deck
          'updated_at'), 'classes': ('collapse',)}),
     )
     readonly_fields = ('created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # una revisión por guardado, con todas las filas del inline ya escritas
+        record_revision(form.instance)
+
+
+class InventoryItemAdmin(admin.ModelAdmin):
+    list_display = ('card', 'quantity', 'updated_at')
+    search_fields = ('card__name',)
+    autocomplete_fields = ('card',)
+    list_select_related = ('card',)
+    ordering = ('card__name',)
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'priority', 'attempts',
+                    'progress', 'created_at', 'updated_at')
+    list_filter = ('status', 'kind')
+    ordering = ('-id',)
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'progress',
+                       'result', 'error', 'created_at', 'updated_at')
+
+
+class CardImageAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'ext', 'size', 'last_used', 'url')
+    search_fields = ('url', 'digest')
+    ordering = ('-last_used',)
+    readonly_fields = ('digest', 'ext', 'size', 'fetched_at', 'last_used')
 
 
 admin.site.register(Card, CardAdmin)
 admin.site.register(Deck, DeckAdmin)
+admin.site.register(InventoryItem, InventoryItemAdmin)
+admin.site.register(Job, JobAdmin)
+admin.site.register(CardImage, CardImageAdmin)
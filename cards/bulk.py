@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import recommend
+from .history import record_deltas
+from .models import Card, CardInDeck, Deck, DeckRevision, InventoryItem
+
+# Borrados masivos como DELETEs directos en SQL.
+#
+# QuerySet.delete() pasa por el Collector: con cascadas o señales (CardInDeck
+# tiene post_delete para el índice de recomendaciones) carga cada fila en
+# memoria antes de borrarla. Aquí se usa _raw_delete(), que emite un único
+# DELETE ... WHERE, y las estadísticas dependientes se actualizan a mano
+# en un solo paso.
+
+
+def _raw_delete(queryset) -> int:
+    return queryset._raw_delete(queryset.db)
+
+
+def clear_deck(deck_id: int) -> int:
+    """
+    Removes every card from a deck.
+
+    Returns:
+        int: Number of CardInDeck rows deleted.
+    """
+    with transaction.atomic():
+        links = CardInDeck.objects.filter(deck_id=deck_id)
+        removed = {card_id: -quantity
+                   for card_id, quantity in links.values_list('card_id', 'quantity')}
+        deleted = _raw_delete(links)
+        record_deltas({deck_id: removed})
+        transaction.on_commit(lambda: recommend.refresh_decks([deck_id]))
+    return deleted
+
+
+def delete_all_decks() -> int:
+    """
+    Deletes every deck with its cards and revisions (three DELETEs).
+
+    Returns:
+        int: Number of decks deleted.
+    """
+    with transaction.atomic():
+        _raw_delete(DeckRevision.objects.all())
+        _raw_delete(CardInDeck.objects.all())
+        deleted = _raw_delete(Deck.objects.all())
+        transaction.on_commit(recommend.clear_index)
+    return deleted
+
+
+def delete_cards(card_ids) -> int:
+    """
+    Deletes cards, removing them from every deck and from the inventory.
+
+    Returns:
+        int: Number of cards deleted.
+    """
+    card_ids = list(card_ids)
+    with transaction.atomic():
+        links = CardInDeck.objects.filter(card_id__in=card_ids)
+        removed = defaultdict(dict)
+        for deck_id, card_id, quantity in links.values_list('deck_id', 'card_id', 'quantity'):
+            removed[deck_id][card_id] = -quantity
+        _raw_delete(links)
+        _raw_delete(InventoryItem.objects.filter(card_id__in=card_ids))
+        deleted = _raw_delete(Card.objects.filter(id__in=card_ids))
+        record_deltas(removed)
+        transaction.on_commit(lambda: recommend.refresh_decks(list(removed)))
+    return deleted
+
+
+def prune_orphan_cards() -> int:
+    """
+    Deletes the cards that are not in any deck nor in the inventory (one
+    DELETE with subqueries).
+
+    Returns:
+        int: Number of cards deleted.
+    """
+    with transaction.atomic():
+        return _raw_delete(Card.objects
+                           .exclude(id__in=CardInDeck.objects.values('card_id'))
+                           .exclude(id__in=InventoryItem.objects.values('card_id')))
@@ -0,0 +1,271 @@
+import mmap
+import struct
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from django.conf import settings
+
+from .models import Card
+
+# ======= Formato del fichero (little endian) =======
+#
+#   header   MAGIC, versión, nº sets, nº cartas y offset de cada sección
+#   sets     registros fijos, ordenados por código
+#   cards    registros fijos, ordenados por id
+#   by_name  u32[] índices de cartas ordenados por nombre en minúsculas
+#   by_set   u32[] índices de cartas agrupados por set (cada set: start, count)
+#   pool     strings UTF-8 sin repetir; los registros guardan (offset u32, len u16)
+#
+# Los procesos lo abren con mmap de solo lectura: todos comparten la misma
+# copia en la page cache y abrirlo no requiere parsear nada.
+
+CATALOG_FILENAME = 'catalog.bin'
+MAGIC = b'MTGC'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sIII5Q')
+_SET = struct.Struct('<IHIHIHII')          # code, name, release_date, start, count
+_CARD = struct.Struct('<qIHIHIHiIHIH')     # id, name, mana_cost, type, set_idx, rarity, image_url
+_U32 = struct.Struct('<I')
+_ID = struct.Struct('<q')
+
+CatalogSet = namedtuple('CatalogSet', ['code', 'name', 'release_date'])
+CatalogCard = namedtuple('CatalogCard', ['id', 'name', 'mana_cost', 'type', 'set',
+                                         'rarity', 'image_url'])
+
+
+def default_catalog_path() -> Path:
+    return Path(settings.CARDS_DATA_DIR) / CATALOG_FILENAME
+
+
+class _StringPool:
+    def __init__(self):
+        self.data = bytearray()
+        self.refs = {}
+
+    def add(self, value: str | None) -> tuple[int, int]:
+        # (0, 0) = cadena vacía / None
+        if not value:
+            return (0, 0)
+        ref = self.refs.get(value)
+        if ref is None:
+            raw = value.encode('utf-8')[:0xFFFF]
+            ref = self.refs[value] = (len(self.data), len(raw))
+            self.data += raw
+        return ref
+
+
+def build_catalog(path: Path | None = None, sets=None) -> tuple[int, int]:
+    """
+    Writes the catalog file from the Card table.
+
+    Args:
+        path (Path, optional): Output file. Default: CARDS_DATA_DIR/catalog.bin.
+        sets (iterable, optional): Objects with code, name and release_date
+            (e.g. mtg_sdk.load_all_sets().values()). Set codes used by cards but
+            missing here are added with just their code.
+
+    Returns:
+        tuple[int, int]: (number of sets, number of cards) written.
+    """
+    path = Path(path or default_catalog_path())
+    pool = _StringPool()
+
+    set_info = {s.code.upper(): (s.name, s.release_date) for s in (sets or [])}
+    cards = list(Card.objects.order_by('id').values_list(
+        'id', 'name', 'mana_cost', 'type', 'set', 'rarity', 'image_url'))
+    for card in cards:
+        if card[4]:
+            set_info.setdefault(card[4].upper(), (None, None))
+
+    set_codes = sorted(set_info)
+    set_index = {code: i for i, code in enumerate(set_codes)}
+
+    card_bytes = bytearray()
+    for card_id, name, mana_cost, type_, set_code, rarity, image_url in cards:
+        card_bytes += _CARD.pack(
+            card_id, *pool.add(name), *pool.add(mana_cost), *pool.add(type_),
+            set_index[set_code.upper()] if set_code else -1,
+            *pool.add(rarity), *pool.add(image_url))
+
+    by_name = sorted(range(len(cards)), key=lambda i: cards[i][1].lower())
+    by_set = sorted((i for i in range(len(cards)) if cards[i][4]),
+                    key=lambda i: (cards[i][4].upper(), cards[i][1].lower()))
+    ranges = {}
+    for pos, i in enumerate(by_set):
+        code = cards[i][4].upper()
+        start, count = ranges.get(code, (pos, 0))
+        ranges[code] = (start, count + 1)
+
+    set_bytes = bytearray()
+    for code in set_codes:
+        name, release_date = set_info[code]
+        start, count = ranges.get(code, (0, 0))
+        set_bytes += _SET.pack(*pool.add(code), *pool.add(name), *pool.add(release_date),
+                               start, count)
+
+    sections = [bytes(set_bytes), bytes(card_bytes),
+                struct.pack(f'<{len(by_name)}I', *by_name),
+                struct.pack(f'<{len(by_set)}I', *by_set),
+                bytes(pool.data)]
+    offsets, offset = [], _HEADER.size
+    for section in sections:
+        offsets.append(offset)
+        offset += len(section)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(set_codes), len(cards), *offsets))
+        for section in sections:
+            f.write(section)
+    # rename atómico: los procesos que ya tienen el fichero mapeado siguen
+    # leyendo la versión anterior hasta que lo reabran
+    tmp.replace(path)
+    return len(set_codes), len(cards)
+
+
+class Catalog:
+    """
+    Read-only view over a catalog file built by build_catalog().
+    Lookups are binary searches straight over the mapped bytes.
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = Path(path or default_catalog_path())
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.n_sets, self.n_cards, self._sets, self._cards,
+         self._by_name, self._by_set, self._pool) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} card catalog.")
+
+    def close(self):
+        self._mm.close()
+
+    def __len__(self):
+        return self.n_cards
+
+    # ======= Lectura de registros =======
+    def _str(self, offset: int, length: int) -> str | None:
+        if not length:
+            return None
+        start = self._pool + offset
+        return self._mm[start:start + length].decode('utf-8')
+
+    def _set_at(self, i: int) -> tuple:
+        return _SET.unpack_from(self._mm, self._sets + i * _SET.size)
+
+    def _card_at(self, i: int) -> CatalogCard:
+        (card_id, n_off, n_len, m_off, m_len, t_off, t_len, set_idx,
+         r_off, r_len, u_off, u_len) = _CARD.unpack_from(self._mm, self._cards + i * _CARD.size)
+        set_code = None
+        if set_idx >= 0:
+            set_code = self._str(*self._set_at(set_idx)[:2])
+        return CatalogCard(card_id, self._str(n_off, n_len), self._str(m_off, m_len),
+                           self._str(t_off, t_len), set_code,
+                           self._str(r_off, r_len), self._str(u_off, u_len))
+
+    def _name_at(self, pos: int) -> str:
+        i = _U32.unpack_from(self._mm, self._by_name + pos * 4)[0]
+        n_off, n_len = struct.unpack_from('<IH', self._mm, self._cards + i * _CARD.size + 8)
+        return self._str(n_off, n_len).lower()
+
+    # ======= Consultas =======
+    def get(self, card_id: int) -> CatalogCard | None:
+        """Card by id."""
+        lo, hi = 0, self.n_cards
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _ID.unpack_from(self._mm, self._cards + mid * _CARD.size)[0] < card_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_cards and _ID.unpack_from(self._mm, self._cards + lo * _CARD.size)[0] == card_id:
+            return self._card_at(lo)
+        return None
+
+    def search(self, prefix: str, limit: int = 20) -> list[CatalogCard]:
+        """Cards whose name starts with `prefix` (case insensitive), alphabetically."""
+        prefix = prefix.lower()
+        lo, hi = 0, self.n_cards
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name_at(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        results = []
+        for pos in range(lo, min(lo + limit, self.n_cards)):
+            if not self._name_at(pos).startswith(prefix):
+                break
+            results.append(self._card_at(_U32.unpack_from(self._mm, self._by_name + pos * 4)[0]))
+        return results
+
+    def _find_set(self, code: str) -> int | None:
+        code = code.upper()
+        lo, hi = 0, self.n_sets
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._str(*self._set_at(mid)[:2]) < code:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_sets and self._str(*self._set_at(lo)[:2]) == code:
+            return lo
+        return None
+
+    def get_set(self, code: str) -> CatalogSet | None:
+        """Set by code (case insensitive)."""
+        i = self._find_set(code)
+        if i is None:
+            return None
+        c_off, c_len, n_off, n_len, d_off, d_len, _start, _count = self._set_at(i)
+        return CatalogSet(self._str(c_off, c_len), self._str(n_off, n_len), self._str(d_off, d_len))
+
+    def in_set(self, code: str) -> list[CatalogCard]:
+        """Every card of a set, alphabetically."""
+        i = self._find_set(code)
+        if i is None:
+            return []
+        start, count = self._set_at(i)[6:]
+        return [self._card_at(_U32.unpack_from(self._mm, self._by_set + pos * 4)[0])
+                for pos in range(start, start + count)]
+
+
+# ======= Catálogo compartido por el proceso =======
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """Process-wide catalog, mapped on first use."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog()
+    return _catalog
+
+
+def card_names(card_ids) -> dict[int, str]:
+    """
+    {card id: name}, read from the catalog; cards missing from it (or all
+    of them, when there is no catalog file) come from one query.
+    """
+    card_ids = list(card_ids)
+    names = {}
+    try:
+        catalog = get_catalog()
+    except FileNotFoundError:
+        catalog = None
+    if catalog is not None:
+        for card_id in card_ids:
+            card = catalog.get(card_id)
+            if card is not None:
+                names[card_id] = card.name
+    missing = [card_id for card_id in card_ids if card_id not in names]
+    if missing:
+        names.update(Card.objects.filter(id__in=missing).values_list('id', 'name'))
+    return names
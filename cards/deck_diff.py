@@ -0,0 +1,112 @@
+from collections import defaultdict
+from itertools import combinations
+
+from .models import CardInDeck
+
+
+def load_deck_contents(deck_ids=None) -> dict[int, dict[int, int]]:
+    """
+    Loads the (card id, quantity) pairs of several decks in a single query.
+
+    Args:
+        deck_ids (iterable[int] | None): Decks to load. If None, loads every deck.
+
+    Returns:
+        dict[int, dict[int, int]]: {deck_id: {card_id: quantity}}. Requested
+        decks without cards are included with an empty dict.
+    """
+    links = CardInDeck.objects.all()
+    contents = defaultdict(dict)
+    if deck_ids is not None:
+        deck_ids = list(deck_ids)
+        links = links.filter(deck_id__in=deck_ids)
+        for deck_id in deck_ids:
+            contents[deck_id] = {}
+
+    for deck_id, card_id, quantity in links.values_list('deck_id', 'card_id', 'quantity'):
+        contents[deck_id][card_id] = quantity
+    return dict(contents)
+
+
+def diff_contents(old: dict[int, int], new: dict[int, int]) -> dict:
+    """
+    Compares two {card_id: quantity} mappings.
+
+    Returns:
+        dict: {
+            "added":   {card_id: quantity},         # solo en new
+            "removed": {card_id: quantity},         # solo en old
+            "changed": {card_id: (old_q, new_q)},   # en ambos con distinta cantidad
+        }
+    """
+    old_ids = old.keys()
+    new_ids = new.keys()
+    return {
+        "added": {c: new[c] for c in new_ids - old_ids},
+        "removed": {c: old[c] for c in old_ids - new_ids},
+        "changed": {c: (old[c], new[c]) for c in old_ids & new_ids if old[c] != new[c]},
+    }
+
+
+def jaccard(a, b) -> float:
+    """
+    Jaccard similarity |a ∩ b| / |a ∪ b| between two sets of card ids.
+    Two empty decks are considered identical (1.0).
+    """
+    inter = len(a & b)
+    union = len(a) + len(b) - inter
+    return inter / union if union else 1.0
+
+
+def diff_decks(deck_a_id: int, deck_b_id: int) -> dict:
+    """
+    Diff between two decks (from A to B) plus their Jaccard overlap.
+    Both decks are loaded with a single query.
+    """
+    contents = load_deck_contents([deck_a_id, deck_b_id])
+    a, b = contents[deck_a_id], contents[deck_b_id]
+    result = diff_contents(a, b)
+    result["similarity"] = jaccard(a.keys(), b.keys())
+    return result
+
+
+def similarity_matrix(deck_ids=None) -> tuple[list[int], list[list[float]]]:
+    """
+    All-pairs Jaccard similarity between decks, based on which cards they
+    contain (quantities are ignored).
+
+    Intersections are counted through an inverted index card -> decks, so
+    only pairs of decks that actually share cards are touched.
+
+    Returns:
+        tuple[list[int], list[list[float]]]: (sorted deck ids, symmetric matrix)
+        where matrix[i][j] is the similarity between ids[i] and ids[j].
+    """
+    contents = load_deck_contents(deck_ids)
+    ids = sorted(contents)
+    pos = {deck_id: i for i, deck_id in enumerate(ids)}
+    sizes = [len(contents[deck_id]) for deck_id in ids]
+
+    decks_by_card = defaultdict(list)
+    for deck_id in ids:
+        for card_id in contents[deck_id]:
+            decks_by_card[card_id].append(pos[deck_id])
+
+    # Intersecciones por pareja (i < j)
+    shared = defaultdict(int)
+    for holders in decks_by_card.values():
+        for pair in combinations(holders, 2):
+            shared[pair] += 1
+
+    n = len(ids)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        matrix[i][i] = 1.0
+        if sizes[i] == 0:
+            # dos decks vacíos son idénticos, igual que en jaccard()
+            for j in range(i + 1, n):
+                if sizes[j] == 0:
+                    matrix[i][j] = matrix[j][i] = 1.0
+    for (i, j), inter in shared.items():
+        matrix[i][j] = matrix[j][i] = inter / (sizes[i] + sizes[j] - inter)
+    return ids, matrix
@@ -0,0 +1,154 @@
+from django.db import transaction
+from django.db.models import Max, Q
+
+from .deck_diff import diff_contents, load_deck_contents
+from .models import Deck, DeckRevision
+
+# Una revisión completa cada N: reconstruir cualquier versión aplica como
+# mucho N - 1 deltas.
+CHECKPOINT_EVERY = 20
+
+
+def _pairs(flat):
+    return zip(flat[0::2], flat[1::2])
+
+
+def _flatten(mapping):
+    return [x for card_qty in sorted(mapping.items()) for x in card_qty]
+
+
+def _replay(revisions, upto):
+    """
+    Applies `revisions` (ordered, starting at a checkpoint) and returns
+    {number: contents} for every number in `upto`.
+    """
+    contents, found = {}, {}
+    for rev in revisions:
+        if rev.is_checkpoint:
+            contents = dict(_pairs(rev.changes))
+        else:
+            for card_id, delta in _pairs(rev.changes):
+                quantity = contents.get(card_id, 0) + delta
+                if quantity:
+                    contents[card_id] = quantity
+                else:
+                    contents.pop(card_id, None)
+        if rev.number in upto:
+            found[rev.number] = dict(contents)
+    return found
+
+
+def _revisions_for(deck_id, numbers):
+    """
+    Revisions needed to rebuild each of `numbers`: for every number, from the
+    checkpoint at or before it up to it. Numbers in the same checkpoint window
+    share one stretch; numbers in different windows each replay their own, so
+    nothing between the windows is read. Two queries.
+    """
+    numbers = sorted(set(numbers))
+    starts = (DeckRevision.objects.filter(deck_id=deck_id, is_checkpoint=True)
+              .aggregate(**{f'start_{n}': Max('number', filter=Q(number__lte=n))
+                            for n in numbers}))
+    stretches = Q()
+    for n in numbers:
+        start = starts[f'start_{n}']
+        if start is None:
+            raise DeckRevision.DoesNotExist(f"Deck {deck_id} has no revision {n}.")
+        stretches |= Q(number__gte=start, number__lte=n)
+    # cada tramo empieza en un checkpoint: _replay lo recorre todo de una vez
+    return (DeckRevision.objects.filter(stretches, deck_id=deck_id)
+            .only('number', 'is_checkpoint', 'changes')
+            .order_by('number'))
+
+
+def get_revision(deck_id: int, number: int) -> dict[int, int]:
+    """
+    Rebuilds the contents {card_id: quantity} of a deck at revision `number`.
+    Two queries and at most CHECKPOINT_EVERY - 1 deltas applied.
+    """
+    found = _replay(_revisions_for(deck_id, [number]), {number})
+    if number not in found:
+        raise DeckRevision.DoesNotExist(f"Deck {deck_id} has no revision {number}.")
+    return found[number]
+
+
+def diff_revisions(deck_id: int, old: int, new: int) -> dict:
+    """
+    Diff (see deck_diff.diff_contents) from revision `old` to revision `new`.
+    Each one is rebuilt from its own checkpoint, so the cost does not grow
+    with the distance between them: two queries and at most
+    2 * CHECKPOINT_EVERY rows.
+    """
+    found = _replay(_revisions_for(deck_id, [old, new]), {old, new})
+    missing = {old, new} - found.keys()
+    if missing:
+        raise DeckRevision.DoesNotExist(f"Deck {deck_id} has no revision {min(missing)}.")
+    return diff_contents(found[old], found[new])
+
+
+def record_revision(deck: Deck) -> DeckRevision | None:
+    """
+    Stores the current contents of `deck` as a new revision, as a delta
+    against the previous one or as a checkpoint every CHECKPOINT_EVERY
+    revisions. Does nothing if the contents did not change.
+
+    Returns:
+        DeckRevision | None: The new revision, or None if nothing changed.
+    """
+    with transaction.atomic():
+        # bloquea el deck: dos guardados a la vez no pueden tomar el mismo número
+        Deck.objects.select_for_update().filter(pk=deck.pk).exists()
+        current = load_deck_contents([deck.pk])[deck.pk]
+        last = (DeckRevision.objects.filter(deck=deck)
+                .aggregate(last=Max('number'))['last'])
+
+        if last is None:
+            return DeckRevision.objects.create(
+                deck=deck, number=1, is_checkpoint=True, changes=_flatten(current))
+
+        diff = diff_contents(get_revision(deck.pk, last), current)
+        if not any(diff.values()):
+            return None
+
+        number = last + 1
+        if number % CHECKPOINT_EVERY == 1:
+            return DeckRevision.objects.create(
+                deck=deck, number=number, is_checkpoint=True, changes=_flatten(current))
+
+        delta = dict(diff['added'])
+        delta.update({card_id: -q for card_id, q in diff['removed'].items()})
+        delta.update({card_id: new - old for card_id, (old, new) in diff['changed'].items()})
+        return DeckRevision.objects.create(
+            deck=deck, number=number, changes=_flatten(delta))
+
+
+def record_deltas(deltas: dict[int, dict[int, int]]) -> list[DeckRevision]:
+    """
+    Records one revision per deck from already known changes
+    {deck_id: {card_id: quantity change}}, e.g. after a bulk delete, without
+    reading the decks back. Decks whose new number falls on a checkpoint are
+    loaded (all in one query) and stored in full. Call it after the changes
+    are written.
+
+    Returns:
+        list[DeckRevision]: The created revisions.
+    """
+    deltas = {deck_id: delta for deck_id, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+    last = dict(DeckRevision.objects.filter(deck_id__in=deltas)
+                .values('deck_id').annotate(last=Max('number'))
+                .values_list('deck_id', 'last'))
+    numbers = {deck_id: last.get(deck_id, 0) + 1 for deck_id in deltas}
+    checkpoints = [deck_id for deck_id, n in numbers.items() if n % CHECKPOINT_EVERY == 1]
+    contents = load_deck_contents(checkpoints) if checkpoints else {}
+
+    revisions = []
+    for deck_id, delta in deltas.items():
+        if deck_id in contents:
+            revisions.append(DeckRevision(deck_id=deck_id, number=numbers[deck_id],
+                                          is_checkpoint=True, changes=_flatten(contents[deck_id])))
+        else:
+            revisions.append(DeckRevision(deck_id=deck_id, number=numbers[deck_id],
+                                          changes=_flatten(delta)))
+    return DeckRevision.objects.bulk_create(revisions)
@@ -0,0 +1,185 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import recommend
+from .history import record_deltas
+from .models import Card, CardInDeck, InventoryItem, identity_key, printing_key
+
+
+def _raw_delete(queryset) -> int:
+    # sin el Collector (ver cards/bulk.py)
+    return queryset._raw_delete(queryset.db)
+
+
+def merge_duplicate_cards() -> int:
+    """
+    Merges cards that share the same identity_key() (same printing, whatever
+    the case or spacing of the name) into the oldest row (lowest id) and
+    normalizes name/set of the rows that are kept.
+
+    CardInDeck rows of the duplicates are moved to the kept card; if the
+    deck already had it, quantities are summed. Owned copies
+    (InventoryItem) are added to the kept card the same way. The affected
+    decks get a revision and are refreshed in the recommendation index.
+
+    Returns:
+        int: Number of duplicate cards deleted.
+    """
+    keep_by_key = {}
+    canonical = {}   # duplicate id -> kept id
+    renamed = {}     # kept id -> clave normalizada, si difiere de lo guardado
+    for card_id, name, set_code in Card.objects.order_by('id').values_list('id', 'name', 'set'):
+        keep = keep_by_key.setdefault(identity_key(name, set_code), card_id)
+        if keep != card_id:
+            canonical[card_id] = keep
+        elif printing_key(name, set_code) != (name, set_code):
+            renamed[card_id] = printing_key(name, set_code)
+
+    with transaction.atomic():
+        if canonical:
+            affected = set(canonical) | set(canonical.values())
+            links = CardInDeck.objects.filter(card_id__in=affected)
+
+            # (deck, kept card) -> [cantidad total, fila existente del card canónico]
+            totals = defaultdict(lambda: [0, None])
+            deltas = defaultdict(lambda: defaultdict(int))
+            for link_id, deck_id, card_id, quantity in links.values_list(
+                    'id', 'deck_id', 'card_id', 'quantity'):
+                keep = canonical.get(card_id, card_id)
+                entry = totals[(deck_id, keep)]
+                entry[0] += quantity
+                if card_id in canonical:
+                    deltas[deck_id][card_id] -= quantity
+                    deltas[deck_id][keep] += quantity
+                else:
+                    entry[1] = link_id
+
+            _raw_delete(CardInDeck.objects.filter(card_id__in=canonical))
+            CardInDeck.objects.bulk_update(
+                [CardInDeck(id=link_id, quantity=total)
+                 for total, link_id in totals.values() if link_id is not None],
+                ['quantity'], batch_size=1000)
+            CardInDeck.objects.bulk_create(
+                [CardInDeck(deck_id=deck_id, card_id=card_id, quantity=total)
+                 for (deck_id, card_id), (total, link_id) in totals.items() if link_id is None],
+                batch_size=1000)
+            _merge_inventory(canonical, affected)
+            _raw_delete(Card.objects.filter(id__in=canonical))
+
+            record_deltas({deck_id: dict(delta) for deck_id, delta in deltas.items()})
+            transaction.on_commit(lambda: recommend.refresh_decks(list(deltas)))
+
+        # Normalizar después de borrar duplicados: no choca con la constraint
+        Card.objects.bulk_update(
+            [Card(id=card_id, name=name, set=set_code)
+             for card_id, (name, set_code) in renamed.items()],
+            ['name', 'set'], batch_size=1000)
+    return len(canonical)
+
+
+def _merge_inventory(canonical: dict[int, int], affected: set[int]) -> None:
+    # una fila por carta: la del card canónico se queda con la suma
+    owned = defaultdict(lambda: [0, None])
+    for item_id, card_id, quantity in (InventoryItem.objects.filter(card_id__in=affected)
+                                       .values_list('id', 'card_id', 'quantity')):
+        entry = owned[canonical.get(card_id, card_id)]
+        entry[0] += quantity
+        if card_id not in canonical:
+            entry[1] = item_id
+
+    _raw_delete(InventoryItem.objects.filter(card_id__in=canonical))
+    InventoryItem.objects.bulk_update(
+        [InventoryItem(id=item_id, quantity=total)
+         for total, item_id in owned.values() if item_id is not None],
+        ['quantity'], batch_size=1000)
+    InventoryItem.objects.bulk_create(
+        [InventoryItem(card_id=card_id, quantity=total)
+         for card_id, (total, item_id) in owned.items() if item_id is None],
+        batch_size=1000)
+
+
+class CardIdentityMap:
+    """
+    In-memory (name, set) -> card id map for bulk imports.
+
+    Loads the known printings in one query, resolves every line of an
+    import with a dict lookup and creates the missing printings in batches
+    with flush(), instead of one get_or_create per line. Names are matched
+    case-insensitively (identity_key()): a 'shock (m10)' line resolves to
+    the existing 'Shock' M10 card.
+
+    Example:
+        identity = CardIdentityMap.for_names(name for name, _set, _qty in decklist)
+        for name, set_code, qty in decklist:
+            identity.add(name, set_code, type=..., mana_cost=...)
+        identity.flush()
+        card_id = identity.get(name, set_code)
+    """
+
+    def __init__(self, queryset=None):
+        queryset = Card.objects.all() if queryset is None else queryset
+        self._ids = {identity_key(name, set_code): card_id
+                     for card_id, name, set_code in queryset.values_list('id', 'name', 'set')}
+        self._pending = {}
+
+    @classmethod
+    def for_names(cls, names) -> 'CardIdentityMap':
+        """Map preloaded with every printing of `names`, in any case."""
+        return cls(_named(names))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return identity_key(*key) in self._ids
+
+    def get(self, name: str, set_code: str | None) -> int | None:
+        """Id of the printing, or None if it is unknown (or not flushed yet)."""
+        return self._ids.get(identity_key(name, set_code))
+
+    def add(self, name: str, set_code: str | None, **fields) -> int | None:
+        """
+        Returns the id of the printing if it is known; otherwise queues it to
+        be created on the next flush() (with the given extra Card fields) and
+        returns None. Queuing the same printing twice keeps the first
+        spelling and fields.
+        """
+        key = identity_key(name, set_code)
+        card_id = self._ids.get(key)
+        if card_id is None and key not in self._pending:
+            name, set_code = printing_key(name, set_code)
+            self._pending[key] = Card(name=name, set=set_code, **fields)
+        return card_id
+
+    def flush(self, batch_size: int = 1000) -> int:
+        """
+        Creates every queued printing and learns their ids.
+
+        Printings created meanwhile by another process are skipped thanks to
+        the unique constraint (ignore_conflicts) and their ids are read back
+        anyway, whatever their spelling.
+
+        Returns:
+            int: Number of printings that were queued.
+        """
+        if not self._pending:
+            return 0
+        pending = self._pending
+        self._pending = {}
+        Card.objects.bulk_create(pending.values(), batch_size=batch_size,
+                                 ignore_conflicts=True)
+
+        names = list({name for name, _set in pending})
+        for i in range(0, len(names), batch_size):
+            for card_id, name, set_code in (_named(names[i:i + batch_size])
+                                            .values_list('id', 'name', 'set')):
+                key = identity_key(name, set_code)
+                if key in pending:
+                    self._ids[key] = card_id
+        return len(pending)
+
+
+def _named(names):
+    # name_key IN (...): usa el índice de la constraint card_unique_printing
+    return Card.objects.filter(name_key__in={identity_key(name, None)[0] for name in names})
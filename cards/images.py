@@ -0,0 +1,283 @@
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.db.models import Max
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+
+from .models import CardImage
+
+try:
+    from PIL import Image
+except ImportError:  # está en requirements.txt; sin él no se generan miniaturas
+    Image = None
+
+# ======= Caché local de imágenes de cartas =======
+#
+#   CARDS_DATA_DIR/images/ab/<sha256>.jpg                  original
+#   CARDS_DATA_DIR/images/thumbs/244x340/ab/<sha256>.jpg   miniatura del grid
+#
+# Los ficheros se nombran por el sha256 de su contenido, así que una URL
+# local no cambia nunca de contenido: se sirven con caché de un año,
+# "immutable" y el digest como ETag. La tabla CardImage une cada URL remota
+# con su digest y guarda el último uso para el desalojo LRU.
+
+# El grid pinta las cartas a 200px de alto: margen para pantallas ~1.7x
+THUMB_SIZE = (244, 340)
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+# last_used se actualiza como mucho una vez cada tantos segundos por imagen y proceso
+TOUCH_EVERY = 600
+BATCH_SIZE = 200
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif',
+                 'webp': 'image/webp'}
+_MAGIC = [(b'\xff\xd8\xff', 'jpg'), (b'\x89PNG\r\n\x1a\n', 'png'), (b'GIF8', 'gif')]
+_DIGEST = re.compile(r'[0-9a-f]{64}')
+
+
+def sniff(data: bytes) -> str | None:
+    """Extension of an image from its first bytes, or None if it is not one."""
+    for magic, ext in _MAGIC:
+        if data.startswith(magic):
+            return ext
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def image_root() -> Path:
+    return Path(settings.CARDS_DATA_DIR) / 'images'
+
+
+def original_path(digest: str, ext: str) -> Path:
+    return image_root() / digest[:2] / f'{digest}.{ext}'
+
+
+def thumb_path(digest: str) -> Path:
+    width, height = THUMB_SIZE
+    return image_root() / 'thumbs' / f'{width}x{height}' / digest[:2] / f'{digest}.jpg'
+
+
+def _write(path: Path, data: bytes) -> None:
+    # mismo nombre = mismo contenido: si ya está no hay nada que escribir
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def make_thumbnail(data: bytes) -> bytes | None:
+    """Grid-size JPEG of an image, or None when Pillow is not installed."""
+    if Image is None:
+        return None
+    with Image.open(io.BytesIO(data)) as img:
+        img.thumbnail(THUMB_SIZE)  # mantiene la proporción y nunca amplía
+        out = io.BytesIO()
+        img.convert('RGB').save(out, 'JPEG', quality=80, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def store_image(url: str, data: bytes) -> CardImage:
+    """
+    Writes an image (and its thumbnail) under its digest.
+
+    Returns:
+        CardImage: Unsaved row for `url`.
+    """
+    ext = sniff(data)
+    if ext is None:
+        raise ValueError(f"{url} did not return an image")
+    digest = hashlib.sha256(data).hexdigest()
+    _write(original_path(digest, ext), data)
+
+    thumb = thumb_path(digest)
+    if not thumb.exists():
+        thumb_data = make_thumbnail(data)
+        if thumb_data:
+            _write(thumb, thumb_data)
+    size = len(data) + (thumb.stat().st_size if thumb.exists() else 0)
+    return CardImage(url=url, digest=digest, ext=ext, size=size)
+
+
+# ======= Descarga =======
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    # una sesión (y sus conexiones keep-alive) por hilo
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def fetch(url: str, timeout: float = 10) -> bytes:
+    with _session().get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        data = bytearray()
+        for chunk in response.iter_content(64 * 1024):
+            data += chunk
+            if len(data) > MAX_IMAGE_BYTES:
+                raise ValueError(f"{url} is larger than {MAX_IMAGE_BYTES} bytes")
+    return bytes(data)
+
+
+def _download(url: str, timeout: float):
+    try:
+        return store_image(url, fetch(url, timeout)), None
+    except (requests.RequestException, ValueError, OSError) as e:
+        return None, f"{url}: {e}"
+
+
+def _save(images: list[CardImage]) -> None:
+    now = timezone.now()
+    for image in images:
+        image.fetched_at = image.last_used = now
+    CardImage.objects.bulk_create(
+        images, update_conflicts=True, unique_fields=['url'],
+        update_fields=['digest', 'ext', 'size', 'fetched_at', 'last_used'])
+    # lo descargado por este proceso se ve sin esperar a la próxima recarga
+    _known.update((image.url, (image.digest, image.ext)) for image in images)
+
+
+def prefetch_images(urls, workers: int = 8, timeout: float = 10,
+                    refetch: bool = False) -> dict:
+    """
+    Downloads images into the cache. Downloads and thumbnails run in
+    `workers` threads; rows are written from this thread in batches.
+
+    Args:
+        urls: Remote image URLs (duplicates and blanks are skipped).
+        refetch (bool): Download URLs that are already cached too.
+
+    Returns:
+        dict: {"fetched": int, "cached": int, "failed": [error, ...]}
+    """
+    urls = list(dict.fromkeys(url for url in urls if url))
+    cached = set() if refetch else set(CardImage.objects.values_list('url', flat=True))
+    todo = [url for url in urls if url not in cached]
+
+    fetched, errors, batch = 0, [], []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for image, error in pool.map(lambda url: _download(url, timeout), todo):
+            if error:
+                errors.append(error)
+                continue
+            batch.append(image)
+            if len(batch) >= BATCH_SIZE:
+                _save(batch)
+                fetched += len(batch)
+                batch = []
+    if batch:
+        _save(batch)
+        fetched += len(batch)
+    return {'fetched': fetched, 'cached': len(urls) - len(todo), 'failed': errors}
+
+
+def evict(budget: int | None = None) -> tuple[int, int]:
+    """
+    Deletes the least recently used images until the cache fits in
+    `budget` bytes (default: CARDS_IMAGE_CACHE_MB).
+
+    Returns:
+        tuple[int, int]: (files removed, bytes freed).
+    """
+    if budget is None:
+        budget = settings.CARDS_IMAGE_CACHE_MB * 1024 * 1024
+    files = list(CardImage.objects.values('digest')
+                 .annotate(size=Max('size'), ext=Max('ext'), used=Max('last_used'))
+                 .order_by('used'))
+    total = sum(f['size'] for f in files)
+    victims = []
+    for f in files:
+        if total <= budget:
+            break
+        victims.append(f)
+        total -= f['size']
+
+    digests = [f['digest'] for f in victims]
+    for i in range(0, len(digests), 500):
+        CardImage.objects.filter(digest__in=digests[i:i + 500]).delete()
+    for f in victims:
+        original_path(f['digest'], f['ext']).unlink(missing_ok=True)
+        thumb_path(f['digest']).unlink(missing_ok=True)
+    return len(victims), sum(f['size'] for f in victims)
+
+
+# ======= Uso desde plantillas y vistas =======
+# Mapa url -> (digest, ext) de todo el caché, cargado con una sola query. Una
+# URL que no está lo recarga como mucho una vez cada RELOAD_EVERY segundos:
+# un grid de cartas sin descargar no cuesta una query por carta.
+RELOAD_EVERY = 60
+_known: dict[str, tuple[str, str]] = {}
+_loaded_at: float | None = None
+_touched: dict[str, float] = {}
+
+
+def _lookup(url: str) -> tuple[str, str] | None:
+    global _known, _loaded_at
+    entry = _known.get(url)
+    if entry is not None:
+        return entry
+    now = time.monotonic()
+    if _loaded_at is not None and now - _loaded_at < RELOAD_EVERY:
+        return None
+    _known = {url: (digest, ext) for url, digest, ext in
+              CardImage.objects.values_list('url', 'digest', 'ext').iterator(chunk_size=2000)}
+    _loaded_at = now
+    return _known.get(url)
+
+
+def local_image_url(url: str | None, thumb: bool = False) -> str | None:
+    """
+    Local URL of a cached image (its grid thumbnail with thumb=True, when
+    there is one), or None if `url` is not cached.
+    """
+    if not url:
+        return None
+    entry = _lookup(url)
+    # otro proceso puede haberla desalojado: basta con mirar el fichero
+    if entry is None or not original_path(*entry).exists():
+        return None
+    digest, ext = entry
+    if thumb and thumb_path(digest).exists():
+        return reverse('card_thumb', args=[*THUMB_SIZE, digest])
+    return reverse('card_image', args=[digest, ext])
+
+
+def touch(digest: str) -> None:
+    """Marks an image as used, for the LRU (throttled per process)."""
+    now = time.monotonic()
+    if now - _touched.get(digest, -TOUCH_EVERY) < TOUCH_EVERY:
+        return
+    _touched[digest] = now
+    CardImage.objects.filter(digest=digest).update(last_used=timezone.now())
+
+
+def serve_image(request, path: Path, digest: str, etag: str, content_type: str):
+    """
+    Response for a cached file: 304 if the client already has it, else
+    the file. Both with the immutable Cache-Control and the ETag.
+    """
+    if not _DIGEST.fullmatch(digest) or not path.exists():
+        raise Http404("Image not cached")
+    touch(digest)
+    etag = f'"{etag}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(path.open('rb'), content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -0,0 +1,77 @@
+from django.db.models import F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .deck_diff import load_deck_contents
+from .models import CardInDeck, Deck, InventoryItem
+
+# Copias que faltan de una fila CardInDeck según el inventario
+_MISSING = Greatest(
+    F('card_links__quantity') - Coalesce(F('card_links__card__inventory__quantity'), Value(0)),
+    Value(0))
+
+
+def deck_buildability(decks=None):
+    """
+    Annotates every deck with `total_cards` and `missing` (copies not in
+    the inventory), in a single grouped query. Each deck is checked on its
+    own: two decks may count the same owned copies (see buildable_together).
+
+    Args:
+        decks (QuerySet, optional): Decks to check. Default: all of them.
+
+    Returns:
+        QuerySet: Decks with .total_cards and .missing, buildable first.
+    """
+    decks = Deck.objects.all() if decks is None else decks
+    return (decks.annotate(total_cards=Coalesce(Sum('card_links__quantity'), 0),
+                           missing=Coalesce(Sum(_MISSING), 0))
+            .order_by('missing', 'title'))
+
+
+def missing_for_decks(deck_ids) -> dict[int, int]:
+    """
+    Copies missing to build all the given decks at the same time, i.e.
+    with the inventory shared between them. One grouped query.
+
+    Returns:
+        dict[int, int]: {card_id: copies missing}; empty if all fit.
+    """
+    rows = (CardInDeck.objects.filter(deck_id__in=list(deck_ids))
+            .values('card_id')
+            .annotate(need=Sum('quantity'),
+                      have=Coalesce(Max('card__inventory__quantity'), 0))
+            .filter(need__gt=F('have')))
+    return {row['card_id']: row['need'] - row['have'] for row in rows}
+
+
+def buildable_together(deck_ids=None) -> list[int]:
+    """
+    Picks decks that can all be built at once from the shared inventory.
+
+    Only decks that are buildable on their own are candidates; they are
+    taken greedily, smallest first, while the remaining copies allow it.
+    Three queries in total.
+
+    Returns:
+        list[int]: Ids of the chosen decks.
+    """
+    candidates = deck_buildability(
+        Deck.objects.filter(pk__in=deck_ids) if deck_ids is not None else None
+    ).filter(missing=0, total_cards__gt=0).order_by('total_cards', 'pk')
+    candidate_ids = list(candidates.values_list('pk', flat=True))
+    if not candidate_ids:
+        return []
+
+    contents = load_deck_contents(candidate_ids)
+    needed_cards = {card_id for cards in contents.values() for card_id in cards}
+    left = dict(InventoryItem.objects.filter(card_id__in=needed_cards)
+                .values_list('card_id', 'quantity'))
+
+    chosen = []
+    for deck_id in candidate_ids:
+        cards = contents[deck_id]
+        if all(left.get(card_id, 0) >= qty for card_id, qty in cards.items()):
+            for card_id, qty in cards.items():
+                left[card_id] -= qty
+            chosen.append(deck_id)
+    return chosen
@@ -0,0 +1,171 @@
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+# ======= Registro de tipos de trabajo =======
+HANDLERS = {}
+
+# Reintentos: espera RETRY_DELAY * 2^(intentos - 1)
+RETRY_DELAY = timedelta(seconds=30)
+# Un trabajo "running" sin noticias en este tiempo se da por huérfano
+STALE_AFTER = timedelta(minutes=30)
+# Actualizaciones de progreso: como mucho una escritura cada tantos segundos
+PROGRESS_INTERVAL = 0.5
+
+
+def job(kind: str):
+    """
+    Registers a function as the handler of a job kind.
+
+    The handler receives a JobContext and the job payload, and its return
+    value (JSON serializable) is stored as the job result.
+
+    Example:
+        @job('rebuild_stats')
+        def rebuild_stats(ctx, payload):
+            ...
+    """
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind: str, payload: dict | None = None, priority: int = 0,
+            max_attempts: int = 3, run_after=None) -> Job:
+    """Adds a job to the queue. Higher priority runs first."""
+    return Job.objects.create(kind=kind, payload=payload or {}, priority=priority,
+                              max_attempts=max_attempts, run_after=run_after)
+
+
+class JobContext:
+    """
+    Passed to handlers to report progress. Counters are merged into
+    Job.progress; writes are throttled to one every PROGRESS_INTERVAL.
+    """
+
+    def __init__(self, job_obj: Job):
+        self.job = job_obj
+        self.progress = dict(job_obj.progress or {})
+        self._started = time.monotonic()
+        self._last_write = 0.0
+
+    def report(self, force: bool = False, **counters) -> None:
+        """
+        Updates progress counters, e.g. report(done=10, total=200, upstream_calls=3).
+        A "rate" (done per second) is added when "done" is reported.
+        """
+        self.progress.update(counters)
+        if 'done' in counters:
+            elapsed = time.monotonic() - self._started
+            self.progress['rate'] = round(self.progress['done'] / elapsed, 1) if elapsed else 0.0
+        now = time.monotonic()
+        if force or now - self._last_write >= PROGRESS_INTERVAL:
+            self._last_write = now
+            Job.objects.filter(pk=self.job.pk).update(
+                progress=self.progress, locked_at=timezone.now(), updated_at=timezone.now())
+
+    def add(self, **counters) -> None:
+        """Increments progress counters, e.g. add(upstream_calls=1)."""
+        self.report(**{k: self.progress.get(k, 0) + v for k, v in counters.items()})
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next(worker: str, kinds=None) -> Job | None:
+    """
+    Takes the next runnable job and marks it as running.
+
+    Claiming is a conditional UPDATE (status still 'queued'), so several
+    worker processes can share the queue on any backend, SQLite included:
+    if another worker got the job first the update touches no rows and we
+    try the next candidate.
+    """
+    now = timezone.now()
+    candidates = (Job.objects.filter(status=Job.QUEUED)
+                  .filter(Q(run_after__isnull=True) | Q(run_after__lte=now))
+                  .order_by('-priority', 'id'))
+    if kinds:
+        candidates = candidates.filter(kind__in=kinds)
+
+    for pk in candidates.values_list('pk', flat=True)[:10]:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, updated_at=now)
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def requeue_stale(stale_after: timedelta = STALE_AFTER) -> int:
+    """Puts back in the queue running jobs whose worker stopped reporting."""
+    limit = timezone.now() - stale_after
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=limit).update(
+        status=Job.QUEUED, locked_by='', locked_at=None, updated_at=timezone.now())
+
+
+def run_job(job_obj: Job) -> Job:
+    """
+    Runs a claimed job and stores its outcome: done with result, queued
+    again with backoff, or failed after max_attempts.
+    """
+    handler = HANDLERS.get(job_obj.kind)
+    job_obj.attempts += 1
+    ctx = JobContext(job_obj)
+    try:
+        if handler is None:
+            raise LookupError(f"Unknown job kind: {job_obj.kind}")
+        result = handler(ctx, job_obj.payload)
+    except Exception:
+        job_obj.error = traceback.format_exc()
+        if handler is not None and job_obj.attempts < job_obj.max_attempts:
+            job_obj.status = Job.QUEUED
+            job_obj.run_after = timezone.now() + RETRY_DELAY * 2 ** (job_obj.attempts - 1)
+        else:
+            job_obj.status = Job.FAILED
+    else:
+        job_obj.status = Job.DONE
+        job_obj.result = result
+        job_obj.error = ''
+    job_obj.progress = ctx.progress
+    job_obj.locked_by = ''
+    job_obj.locked_at = None
+    job_obj.save()
+    return job_obj
+
+
+def work(kinds=None, once: bool = False, sleep: float = 1.0, stdout=None) -> int:
+    """
+    Worker loop: claims and runs jobs until the queue is empty (once=True)
+    or forever, sleeping `sleep` seconds when there is nothing to do.
+
+    Returns:
+        int: Number of jobs run.
+    """
+    from . import tasks  # noqa: F401  registra los handlers
+
+    worker = worker_name()
+    done = 0
+    requeue_stale()
+    while True:
+        close_old_connections()
+        job_obj = claim_next(worker, kinds)
+        if job_obj is None:
+            if once:
+                return done
+            time.sleep(sleep)
+            requeue_stale()
+            continue
+        run_job(job_obj)
+        done += 1
+        if stdout:
+            stdout.write(f"{job_obj} attempt {job_obj.attempts}")
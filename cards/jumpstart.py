@@ -0,0 +1,173 @@
+import re
+
+import numpy as np
+from django.db import connection, transaction
+
+from . import recommend
+from .models import Card, CardInDeck, Deck
+
+# ======= Estructura de un half-deck de Jumpstart (20 cartas) =======
+PACK_SIZE = 20
+BASIC_LANDS = 8
+
+# Un tema = un color. Tierra básica que acompaña a cada tema.
+THEMES = {
+    'W': 'Plains',
+    'U': 'Island',
+    'B': 'Swamp',
+    'R': 'Mountain',
+    'G': 'Forest',
+}
+THEME_NAMES = {'W': 'White', 'U': 'Blue', 'B': 'Black', 'R': 'Red', 'G': 'Green'}
+
+# Huecos de rareza del resto del pack: (slot, cartas, {rarity: peso del grupo})
+# El hueco "rare" saca mítica 1 de cada 8 veces, como en los sobres.
+SLOTS = (
+    ('rare', 1, {'Rare': 7, 'Mythic': 1}),
+    ('uncommon', 3, {'Uncommon': 1}),
+    ('common', PACK_SIZE - BASIC_LANDS - 4, {'Common': 1}),
+)
+
+_COLOR_SYMBOL = re.compile(r'\{([WUBRG])\}')
+
+
+def card_theme(mana_cost: str | None) -> str | None:
+    """
+    Returns the theme (color letter) of a mono-colored card, or None for
+    colorless and multicolored cards. Hybrid symbols are ignored.
+    """
+    colors = set(_COLOR_SYMBOL.findall(mana_cost or ''))
+    return colors.pop() if len(colors) == 1 else None
+
+
+class PackPool:
+    """
+    Card pool indexed by theme and rarity slot, built once from the local
+    Card table and reused for every pack.
+
+    For every (theme, slot) it keeps a NumPy array of card ids and their
+    probabilities, so a slot is filled for every pack of a theme with a
+    single Generator.choice() call. Each rarity group gets the slot weight
+    as a whole, spread evenly over its cards (one mythic in 8 rare slots
+    regardless of how many rares the pool has).
+    """
+
+    def __init__(self, cards=None):
+        if cards is None:
+            cards = Card.objects.values_list('id', 'name', 'type', 'mana_cost', 'rarity')
+
+        by_rarity = {theme: {} for theme in THEMES}
+        self.basics = {}
+        max_id = 0
+        for card_id, name, type_, mana_cost, rarity in cards:
+            max_id = max(max_id, card_id)
+            if type_ and 'Land' in type_:
+                if name in THEMES.values():
+                    # una sola printing por básica basta
+                    self.basics.setdefault(name, card_id)
+                continue
+            theme = card_theme(mana_cost)
+            if theme:
+                by_rarity[theme].setdefault(rarity, []).append(card_id)
+        # (pack, carta) se codifica como pack * _width + card_id
+        self._width = max_id + 1
+
+        # {theme: [(slot_size, ids, probabilities), ...]}
+        self.slots = {}
+        for theme, groups in by_rarity.items():
+            theme_slots = []
+            for _slot, size, weights in SLOTS:
+                ids, card_weights = [], []
+                for rarity, weight in weights.items():
+                    group = groups.get(rarity)
+                    if not group:
+                        continue
+                    ids.extend(group)
+                    card_weights.extend([weight / len(group)] * len(group))
+                if not ids:
+                    break
+                p = np.array(card_weights)
+                theme_slots.append((size, np.array(ids, dtype=np.int64), p / p.sum()))
+            else:
+                self.slots[theme] = theme_slots
+
+    def themes(self) -> list[str]:
+        """Themes with enough cards in every rarity slot to build a pack."""
+        return [t for t in THEMES if t in self.slots]
+
+    def sample(self, theme: str, count: int, rng: np.random.Generator):
+        """
+        Samples `count` half-decks of the given theme at once: one
+        Generator.choice() per rarity slot for all the packs, and a single
+        np.unique() to turn the (count x PACK_SIZE) matrix into quantities.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: (pack, card_id,
+            quantity) arrays with one entry per distinct card of each pack,
+            `pack` going from 0 to count - 1. PACK_SIZE cards per pack
+            (fewer only if the basic land for the theme is not in the pool).
+        """
+        if theme not in self.slots:
+            raise ValueError(f"Not enough cards in the pool for theme: {theme}")
+
+        drawn = [rng.choice(ids, size=(count, size), p=p) for size, ids, p in self.slots[theme]]
+        basic = self.basics.get(THEMES[theme])
+        if basic is not None:
+            drawn.append(np.full((count, BASIC_LANDS), basic, dtype=np.int64))
+        keys = np.arange(count, dtype=np.int64)[:, None] * self._width + np.hstack(drawn)
+        keys, quantities = np.unique(keys, return_counts=True)
+        return keys // self._width, keys % self._width, quantities
+
+
+def generate_packs(count: int, themes: list[str] | None = None, seed: int | None = None,
+                   pool: PackPool | None = None, batch_size: int = 5000) -> list[Deck]:
+    """
+    Generates `count` Jumpstart half-decks and saves them in one transaction
+    (decks with bulk_create, their cards with a batched executemany).
+
+    Args:
+        count (int): Number of packs to generate.
+        themes (list[str], optional): Theme letters to draw from (round robin).
+            Defaults to every theme the pool can build.
+        seed (int, optional): Seed for reproducible event pools.
+        pool (PackPool, optional): Prebuilt pool, to reuse across calls.
+        batch_size (int, optional): Rows per insert batch. Defaults to 5000.
+
+    Returns:
+        list[Deck]: The created decks.
+    """
+    pool = pool or PackPool()
+    themes = themes or pool.themes()
+    if not themes:
+        raise ValueError("The card pool cannot build any Jumpstart theme.")
+    rng = np.random.default_rng(seed)
+
+    # round robin: el pack i es del tema themes[i % len(themes)]; cada tema
+    # se muestrea entero de una vez
+    sampled = [pool.sample(theme, len(range(t, count, len(themes))), rng)
+               for t, theme in enumerate(themes)]
+
+    with transaction.atomic():
+        decks = Deck.objects.bulk_create(
+            [Deck(title=f"Jumpstart {THEME_NAMES[themes[i % len(themes)]]} #{i + 1}",
+                  format='Jumpstart')
+             for i in range(count)],
+            batch_size=batch_size)
+        # Las filas de CardInDeck (~13 por pack) van con executemany: crear
+        # cientos de miles de instancias para bulk_create cuesta más que el INSERT.
+        deck_ids = np.array([deck.pk for deck in decks], dtype=np.int64)
+        rows = []
+        for t, (packs, card_ids, quantities) in enumerate(sampled):
+            rows.extend(zip(deck_ids[t + packs * len(themes)].tolist(),
+                            card_ids.tolist(), quantities.tolist()))
+        meta = CardInDeck._meta
+        sql = 'INSERT INTO {} ({}, {}, {}) VALUES (%s, %s, %s)'.format(
+            connection.ops.quote_name(meta.db_table),
+            *(connection.ops.quote_name(meta.get_field(f).column)
+              for f in ('deck', 'card', 'quantity')))
+        with connection.cursor() as cursor:
+            for i in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[i:i + batch_size])
+        # el executemany no dispara las señales de CardInDeck
+        transaction.on_commit(lambda: recommend.refresh_decks([deck.pk for deck in decks]))
+    return decks
@@ -0,0 +1,115 @@
+import gc
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from cards.records import CardRecord
+
+# Respuesta típica de la API por carta (todos los campos que trae mtgsdk.Card)
+_SETS = [('M10', 'Magic 2010'), ('ISD', 'Innistrad'), ('SOI', 'Shadows over Innistrad'),
+         ('DOM', 'Dominaria'), ('MOM', 'March of the Machine')]
+_TYPES = [('Creature — Human Wizard', ['Human', 'Wizard']), ('Instant', []),
+          ('Sorcery', []), ('Legendary Creature — Angel', ['Angel']), ('Basic Land — Forest', ['Forest'])]
+_RARITIES = ['Common', 'Uncommon', 'Rare', 'Mythic']
+
+
+def _api_response(i: int, rng: random.Random) -> dict:
+    set_code, set_name = rng.choice(_SETS)
+    type_line, subtypes = rng.choice(_TYPES)
+    return {
+        'name': f"Card {i}", 'multiverseid': 400000 + i, 'layout': 'normal', 'names': None,
+        'manaCost': '{2}{W}', 'cmc': 3.0, 'colors': ['White'], 'colorIdentity': ['W'],
+        # los strings de la API llegan como objetos nuevos en cada carta
+        'type': ''.join(type_line), 'supertypes': None, 'subtypes': [''.join(s) for s in subtypes],
+        'types': ['Creature'], 'rarity': ''.join(rng.choice(_RARITIES)),
+        'text': "Flying, vigilance\nWhen this creature enters, you gain 3 life.",
+        'flavor': "A long flavor text that nobody uses in the app.", 'artist': 'Someone',
+        'number': str(i), 'power': '2', 'toughness': '3', 'loyalty': None,
+        'variations': [], 'watermark': None, 'border': None, 'timeshifted': None,
+        'hand': None, 'life': None, 'reserved': None, 'releaseDate': None, 'starter': None,
+        'rulings': [{'date': '2020-01-01', 'text': 'A ruling.'}],
+        'foreignNames': [{'name': f"Carte {i}", 'language': 'French', 'multiverseid': i}],
+        'printings': [set_code, 'M20'], 'originalText': "Flying, vigilance", 'originalType': type_line,
+        'legalities': [{'format': 'Modern', 'legality': 'Legal'}], 'source': None,
+        'imageUrl': f"http://gatherer.wizards.com/Handlers/Image.ashx?multiverseid={i}&type=card",
+        'set': ''.join(set_code), 'setName': ''.join(set_name), 'id': f"{i:032x}",
+    }
+
+
+def _snake(key: str) -> str:
+    return ''.join('_' + c.lower() if c.isupper() else c for c in key)
+
+
+def _sdk_cards(n: int) -> list:
+    rng = random.Random(0)
+    attrs = {key: _snake(key) for key in _api_response(0, rng)}
+    try:
+        from mtgsdk import Card
+    except ImportError:
+        Card = None
+    cards = []
+    for i in range(n):
+        response = _api_response(i, rng)
+        if Card is not None:
+            cards.append(Card(response))
+        else:
+            # misma forma que mtgsdk.Card: un atributo snake_case por campo
+            obj = type('SdkCard', (), {})()
+            for key, value in response.items():
+                setattr(obj, attrs[key], value)
+            cards.append(obj)
+    return cards
+
+
+def _as_dict(c) -> dict:
+    # lo que hacía mtg_sdk antes de CardRecord
+    return {'name': c.name, 'set': c.set, 'set_name': c.set_name, 'type': c.type,
+            'subtypes': c.subtypes, 'mana_cost': c.mana_cost, 'text': c.text,
+            'power': c.power, 'toughness': c.toughness, 'loyalty': c.loyalty,
+            'rarity': c.rarity, 'image_url': c.image_url}
+
+
+def _measure(n: int, convert) -> tuple[int, int, float]:
+    """
+    Builds n SDK cards, converts them and drops the SDK objects.
+
+    Returns:
+        tuple[int, int, float]: (bytes held by the SDK objects, bytes still
+        held by the converted cards afterwards, conversion seconds).
+    """
+    gc.collect()
+    tracemalloc.start()
+    sdk_cards = _sdk_cards(n)
+    sdk_size = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    converted = [convert(c) for c in sdk_cards]
+    elapsed = time.perf_counter() - t0
+    del sdk_cards
+    gc.collect()
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del converted
+    return sdk_size, kept, elapsed
+
+
+class Command(BaseCommand):
+    help = "Compares the memory of N SDK cards, per-card dicts and CardRecord (default 100k)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        n = options['cards']
+        mb = 1024 * 1024
+        sdk_size, dict_size, dict_time = _measure(n, _as_dict)
+        _sdk_size, rec_size, rec_time = _measure(n, CardRecord.from_sdk)
+
+        self.stdout.write(f"{n} cards (memory still held once the SDK objects are dropped)")
+        self.stdout.write(f"  SDK objects:         {sdk_size / mb:8.1f} MB")
+        self.stdout.write(f"  per-card dicts:      {dict_size / mb:8.1f} MB  ({dict_time:.2f}s)")
+        self.stdout.write(f"  CardRecord (slots):  {rec_size / mb:8.1f} MB  ({rec_time:.2f}s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"  CardRecord uses {rec_size / dict_size:.0%} of the dicts' memory "
+            f"and {rec_size / sdk_size:.0%} of the SDK objects'."))
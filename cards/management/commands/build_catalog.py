@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cards.catalog import build_catalog, default_catalog_path
+
+
+class Command(BaseCommand):
+    help = "Writes the read-only card/set catalog file that worker processes mmap."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help="Catalog file. Default: CARDS_DATA_DIR/catalog.bin.")
+        parser.add_argument('--with-sets', action='store_true',
+                            help="Include set names and release dates from the API (mtg_sdk).")
+
+    def handle(self, *args, **options):
+        t0 = time.perf_counter()
+        sets = None
+        if options['with_sets']:
+            from cards.mtg_sdk import load_all_sets
+            sets = load_all_sets().values()
+
+        path = options['output'] or default_catalog_path()
+        n_sets, n_cards = build_catalog(path, sets)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {n_sets} sets and {n_cards} cards to {path} "
+            f"in {time.perf_counter() - t0:.2f}s."))
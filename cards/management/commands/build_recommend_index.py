@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cards.recommend import RecommendIndex, default_index_path
+
+
+class Command(BaseCommand):
+    help = "Builds the deck/card recommendation index from CardInDeck and writes it to disk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help="Index file. Default: CARDS_DATA_DIR/recommend_index.bin.")
+
+    def handle(self, *args, **options):
+        t0 = time.perf_counter()
+        index = RecommendIndex.build()
+        path = options['output'] or default_index_path()
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index.vectors)} decks and {len(index.postings)} cards "
+            f"into {path} in {time.perf_counter() - t0:.2f}s."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from cards.identity import merge_duplicate_cards
+
+
+class Command(BaseCommand):
+    help = ("Merges duplicate printings (same name, in any case, and set) and repoints "
+            "their deck entries.")
+
+    def handle(self, *args, **options):
+        merged = merge_duplicate_cards()
+        self.stdout.write(self.style.SUCCESS(f"Merged {merged} duplicate cards."))
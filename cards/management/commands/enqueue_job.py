@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.jobs import HANDLERS, enqueue
+from cards import tasks  # noqa: F401  registra los handlers
+
+
+class Command(BaseCommand):
+    help = "Adds a background job to the queue (e.g. refresh_cards, import_decklist, rebuild_stats)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', help="Job kind.")
+        parser.add_argument('--payload', default='{}', help="JSON payload.")
+        parser.add_argument('--priority', type=int, default=0,
+                            help="Higher runs first. Default: 0.")
+
+    def handle(self, *args, **options):
+        if options['kind'] not in HANDLERS:
+            raise CommandError(
+                f"Unknown job kind: {options['kind']}. Known: {', '.join(sorted(HANDLERS))}.")
+        try:
+            payload = json.loads(options['payload'])
+        except json.JSONDecodeError as e:
+            raise CommandError(f"Invalid payload: {e}")
+
+        job = enqueue(options['kind'], payload, priority=options['priority'])
+        self.stdout.write(self.style.SUCCESS(f"Queued {job}."))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.jumpstart import THEMES, generate_packs
+
+
+class Command(BaseCommand):
+    help = "Generates Jumpstart half-decks (20 cards) from the local card pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help="Number of packs to generate.")
+        parser.add_argument('--theme', action='append', choices=sorted(THEMES),
+                            help="Theme color letter. Repeat for several themes. Default: all.")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Random seed, for reproducible event pools.")
+
+    def handle(self, *args, **options):
+        if options['count'] < 1:
+            raise CommandError("count must be at least 1.")
+
+        t0 = time.perf_counter()
+        try:
+            decks = generate_packs(
+                options['count'], themes=options['theme'], seed=options['seed'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(decks)} packs in {time.perf_counter() - t0:.2f}s."))
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cards.images import Image, evict, image_root, prefetch_images
+from cards.models import Card
+
+
+class Command(BaseCommand):
+    help = ("Downloads card images into the local cache (CARDS_DATA_DIR/images) with "
+            "grid thumbnails, then trims it to CARDS_IMAGE_CACHE_MB (least recently used first).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8,
+                            help="Parallel downloads. Default: 8.")
+        parser.add_argument('--timeout', type=float, default=10,
+                            help="Seconds per request. Default: 10.")
+        parser.add_argument('--refetch', action='store_true',
+                            help="Download images that are already cached too.")
+        parser.add_argument('--budget-mb', type=int, default=None,
+                            help="Disk budget. Default: CARDS_IMAGE_CACHE_MB.")
+
+    def handle(self, *args, **options):
+        if Image is None:
+            self.stderr.write(self.style.WARNING(
+                "Pillow is not installed: no thumbnails, the grid will use the full images."))
+
+        t0 = time.perf_counter()
+        urls = (Card.objects.exclude(image_url__isnull=True).exclude(image_url='')
+                .values_list('image_url', flat=True))
+        stats = prefetch_images(urls, workers=options['workers'], timeout=options['timeout'],
+                                refetch=options['refetch'])
+        for error in stats['failed'][:20]:
+            self.stderr.write(error)
+        if len(stats['failed']) > 20:
+            self.stderr.write(f"... and {len(stats['failed']) - 20} more errors.")
+
+        budget_mb = options['budget_mb']
+        if budget_mb is None:
+            budget_mb = settings.CARDS_IMAGE_CACHE_MB
+        removed, freed = evict(budget_mb * 1024 * 1024)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Fetched {stats['fetched']} images ({stats['cached']} already cached, "
+            f"{len(stats['failed'])} failed) into {image_root()} "
+            f"in {time.perf_counter() - t0:.2f}s. "
+            f"Evicted {removed} ({freed / 1024 / 1024:.1f} MB)."))
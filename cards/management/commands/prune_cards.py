@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cards.bulk import prune_orphan_cards
+
+
+class Command(BaseCommand):
+    help = "Deletes the cards that are not in any deck nor in the inventory."
+
+    def handle(self, *args, **options):
+        deleted = prune_orphan_cards()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} orphaned cards."))
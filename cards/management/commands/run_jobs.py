@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from cards.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Runs background jobs from the database queue. Several workers can run at once."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Exit when the queue is empty instead of waiting for jobs.")
+        parser.add_argument('--kind', action='append',
+                            help="Only run jobs of this kind. Repeat for several kinds.")
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty. Default: 1.")
+
+    def handle(self, *args, **options):
+        done = work(kinds=options['kind'], once=options['once'],
+                    sleep=options['sleep'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Ran {done} jobs."))
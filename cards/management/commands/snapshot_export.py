@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cards.snapshot import export_snapshot
+
+
+class Command(BaseCommand):
+    help = "Exports cards, decks, deck contents, revisions and inventory to a snapshot archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archive to write (e.g. snapshot.jsonl.gz).")
+
+    def handle(self, *args, **options):
+        t0 = time.perf_counter()
+        counts = export_snapshot(options['path'])
+        rows = ', '.join(f"{n} {table}" for table, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {rows} to {options['path']} in {time.perf_counter() - t0:.2f}s."))
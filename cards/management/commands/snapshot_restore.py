@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from cards.snapshot import restore_snapshot
+
+
+class Command(BaseCommand):
+    help = "Restores a snapshot archive written by snapshot_export, in one transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archive to read.")
+        parser.add_argument('--replace', action='store_true',
+                            help="Delete the current cards, decks and inventory first.")
+
+    def handle(self, *args, **options):
+        t0 = time.perf_counter()
+        try:
+            counts = restore_snapshot(options['path'], replace=options['replace'])
+        except (ValueError, DatabaseError) as e:
+            raise CommandError(f"Restore failed, nothing was changed: {e}")
+        rows = ', '.join(f"{n} {table}" for table, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {rows} in {time.perf_counter() - t0:.2f}s."))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_rename_secondary_types_card_subtypes_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['type', 'mana_cost', 'name'], name='card_admin_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='card_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['-created_at'], name='deck_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_card_deck_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='rarity',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='deck',
+            name='format',
+            field=models.CharField(choices=[('Standard', 'Standard'), ('Modern', 'Modern'), ('Legacy', 'Legacy'), ('Vintage', 'Vintage'), ('Jumpstart', 'Jumpstart'), ('Commander', 'Commander'), ('Premondern', 'Premondern'), ('Pioneer', 'Pioneer'), ('Historic', 'Historic'), ('Brawl', 'Brawl'), ('Pauper', 'Pauper'), ('Frontier', 'Frontier'), ('Old School', 'Old School'), ('Singleton', 'Singleton'), ('Two-Headed Giant', 'Two-Headed Giant'), ('Oathbreaker', 'Oathbreaker'), ('Momir Basic', 'Momir Basic'), ('Peasant', 'Peasant'), ('Canadian Highlander', 'Canadian Highlander'), ('Tiny Leaders', 'Tiny Leaders'), ('Epic', 'Epic'), ('Conspiracy', 'Conspiracy'), ('Planechase', 'Planechase'), ('Archenemy', 'Archenemy'), ('Vanguard', 'Vanguard'), ('Other', 'Other')], default='Jumpstart', max_length=50),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:18
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    # Copia congelada de la fusión tal y como era en esta migración: no
+    # depende del código actual de la app, solo de los modelos históricos.
+    Card = apps.get_model('cards', 'Card')
+    CardInDeck = apps.get_model('cards', 'CardInDeck')
+
+    keep_by_key = {}
+    canonical = {}   # duplicate id -> kept id
+    renamed = {}     # kept id -> (name, set) normalizados
+    for card_id, name, set_code in Card.objects.order_by('id').values_list('id', 'name', 'set'):
+        key = (name.strip(), set_code.strip().upper() if set_code else None)
+        keep = keep_by_key.setdefault(key, card_id)
+        if keep != card_id:
+            canonical[card_id] = keep
+        elif key != (name, set_code):
+            renamed[card_id] = key
+
+    if canonical:
+        affected = set(canonical) | set(canonical.values())
+        totals = defaultdict(lambda: [0, None])
+        for link_id, deck_id, card_id, quantity in (CardInDeck.objects.filter(card_id__in=affected)
+                                                    .values_list('id', 'deck_id', 'card_id', 'quantity')):
+            entry = totals[(deck_id, canonical.get(card_id, card_id))]
+            entry[0] += quantity
+            if card_id not in canonical:
+                entry[1] = link_id
+
+        links = CardInDeck.objects.filter(card_id__in=canonical)
+        links._raw_delete(links.db)
+        CardInDeck.objects.bulk_update(
+            [CardInDeck(id=link_id, quantity=total)
+             for total, link_id in totals.values() if link_id is not None],
+            ['quantity'], batch_size=1000)
+        CardInDeck.objects.bulk_create(
+            [CardInDeck(deck_id=deck_id, card_id=card_id, quantity=total)
+             for (deck_id, card_id), (total, link_id) in totals.items() if link_id is None],
+            batch_size=1000)
+        cards = Card.objects.filter(id__in=canonical)
+        cards._raw_delete(cards.db)
+
+    Card.objects.bulk_update(
+        [Card(id=card_id, name=name, set=set_code) for card_id, (name, set_code) in renamed.items()],
+        ['name', 'set'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0004_card_rarity_deck_format_not_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='card',
+            constraint=models.UniqueConstraint(fields=('name', 'set'), name='card_unique_printing'),
+        ),
+        migrations.AddConstraint(
+            model_name='card',
+            constraint=models.UniqueConstraint(condition=models.Q(('set__isnull', True)), fields=('name',), name='card_unique_name_without_set'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0005_card_unique_printing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeckRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('is_checkpoint', models.BooleanField(default=False)),
+                ('changes', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('deck', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='cards.deck')),
+            ],
+            options={
+                'ordering': ['deck', 'number'],
+                'constraints': [models.UniqueConstraint(fields=('deck', 'number'), name='deck_revision_unique_number')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0008_inventoryitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, unique=True)),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('ext', models.CharField(max_length=5)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:46
+
+from collections import defaultdict
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def merge_case_duplicates(apps, schema_editor):
+    # Copia congelada: funde las cartas que solo difieren en mayúsculas del
+    # nombre (ahora la misma printing), sumando cantidades en decks e inventario.
+    Card = apps.get_model('cards', 'Card')
+    CardInDeck = apps.get_model('cards', 'CardInDeck')
+    InventoryItem = apps.get_model('cards', 'InventoryItem')
+
+    keep_by_key = {}
+    canonical = {}   # duplicate id -> kept id
+    for card_id, name, set_code in Card.objects.order_by('id').values_list('id', 'name', 'set'):
+        key = (name.strip().lower(), set_code.strip().upper() if set_code else None)
+        keep = keep_by_key.setdefault(key, card_id)
+        if keep != card_id:
+            canonical[card_id] = keep
+    if not canonical:
+        return
+    affected = set(canonical) | set(canonical.values())
+
+    # deck -> carta: la fila del card canónico se queda con la suma
+    totals = defaultdict(lambda: [0, None])
+    for link_id, deck_id, card_id, quantity in (CardInDeck.objects.filter(card_id__in=affected)
+                                                .values_list('id', 'deck_id', 'card_id', 'quantity')):
+        entry = totals[(deck_id, canonical.get(card_id, card_id))]
+        entry[0] += quantity
+        if card_id not in canonical:
+            entry[1] = link_id
+    links = CardInDeck.objects.filter(card_id__in=canonical)
+    links._raw_delete(links.db)
+    CardInDeck.objects.bulk_update(
+        [CardInDeck(id=link_id, quantity=total)
+         for total, link_id in totals.values() if link_id is not None],
+        ['quantity'], batch_size=1000)
+    CardInDeck.objects.bulk_create(
+        [CardInDeck(deck_id=deck_id, card_id=card_id, quantity=total)
+         for (deck_id, card_id), (total, link_id) in totals.items() if link_id is None],
+        batch_size=1000)
+
+    # inventario: una fila por carta
+    owned = defaultdict(lambda: [0, None])
+    for item_id, card_id, quantity in (InventoryItem.objects.filter(card_id__in=affected)
+                                       .values_list('id', 'card_id', 'quantity')):
+        entry = owned[canonical.get(card_id, card_id)]
+        entry[0] += quantity
+        if card_id not in canonical:
+            entry[1] = item_id
+    items = InventoryItem.objects.filter(card_id__in=canonical)
+    items._raw_delete(items.db)
+    InventoryItem.objects.bulk_update(
+        [InventoryItem(id=item_id, quantity=total)
+         for total, item_id in owned.values() if item_id is not None],
+        ['quantity'], batch_size=1000)
+    InventoryItem.objects.bulk_create(
+        [InventoryItem(card_id=card_id, quantity=total)
+         for card_id, (total, item_id) in owned.items() if item_id is None],
+        batch_size=1000)
+
+    cards = Card.objects.filter(id__in=canonical)
+    cards._raw_delete(cards.db)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0009_cardimage'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='card',
+            name='card_unique_printing',
+        ),
+        migrations.RemoveConstraint(
+            model_name='card',
+            name='card_unique_name_without_set',
+        ),
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='card',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), models.F('set'), name='card_unique_printing'),
+        ),
+        migrations.AddConstraint(
+            model_name='card',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), condition=models.Q(('set__isnull', True)), name='card_unique_name_without_set'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:12
+
+import importlib
+
+from django.db import migrations, models
+
+# Función congelada de la migración anterior: funde las cartas con la misma
+# clave (nombre sin espacios de más y en minúsculas, set en mayúsculas)
+merge_case_duplicates = importlib.import_module(
+    'cards.migrations.0010_card_unique_printing_ci').merge_case_duplicates
+
+
+def fill_name_key(apps, schema_editor):
+    # LOWER() de SQLite solo pasa a minúsculas ASCII: 'Æther Vial' y
+    # 'æther vial' pudieron entrar como cartas distintas. Se funden con la
+    # clave de Python antes de rellenar name_key.
+    merge_case_duplicates(apps, schema_editor)
+
+    Card = apps.get_model('cards', 'Card')
+    cards = []
+    for card_id, name, set_code in Card.objects.values_list('id', 'name', 'set').iterator():
+        name = name.strip()
+        cards.append(Card(id=card_id, name=name, name_key=name.lower(),
+                          set=set_code.strip().upper() if set_code else None))
+    Card.objects.bulk_update(cards, ['name', 'name_key', 'set'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0010_card_unique_printing_ci'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='card',
+            name='card_unique_printing',
+        ),
+        migrations.RemoveConstraint(
+            model_name='card',
+            name='card_unique_name_without_set',
+        ),
+        migrations.RemoveIndex(
+            model_name='card',
+            name='card_name_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_name_key, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='card',
+            constraint=models.UniqueConstraint(fields=('name_key', 'set'), name='card_unique_printing'),
+        ),
+        migrations.AddConstraint(
+            model_name='card',
+            constraint=models.UniqueConstraint(condition=models.Q(('set__isnull', True)), fields=('name_key',), name='card_unique_name_without_set'),
+        ),
+    ]
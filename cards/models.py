@@ -1,9 +1,46 @@
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
 
+def printing_key(name: str, set_code: str | None) -> tuple[str, str | None]:
+    """
+    Canonical identity of a printing: (name, set code), trimmed and with the
+    set code in upper case. Card.save() stores cards already normalized.
+    """
+    return (name.strip(), set_code.strip().upper() if set_code else None)
+
+
+def identity_key(name: str, set_code: str | None) -> tuple[str, str | None]:
+    """
+    Key shared by every spelling of a printing: printing_key() with the name
+    in lower case. Card.name_key stores the name part, so the database
+    compares exactly what Python computes (SQLite's LOWER() only knows ASCII).
+    """
+    name, set_code = printing_key(name, set_code)
+    return (name.lower(), set_code)
+
+
+class CardQuerySet(models.QuerySet):
+    # bulk_create/bulk_update no pasan por Card.save(): normalizan aquí igual
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for card in objs:
+            card.normalize()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        fields = list(fields)
+        if 'name' in fields or 'set' in fields:
+            objs = list(objs)
+            for card in objs:
+                card.normalize()
+            fields = list(dict.fromkeys(fields + ['name', 'set', 'name_key']))
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
 class Card(models.Model):
     TYPES_CHOICES = [
         # Permanentes principales
@@ -27,17 +64,47 @@ class Card(models.Model):
     ]
 
     name = models.CharField(max_length=100)
+    # identity_key(): nombre sin espacios de más y en minúsculas, lo calcula Python
+    name_key = models.CharField(max_length=100, editable=False)
     mana_cost = models.CharField(max_length=20, blank=True, null=True)
     type = models.CharField(max_length=100, blank=True, null=True)
     subtypes = models.CharField(max_length=100, blank=True, null=True)
     image_url = models.URLField(max_length=200, blank=True, null=True)
     box_description = models.TextField(blank=True, null=True)
     set = models.CharField(max_length=20, blank=True, null=True)
+    rarity = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CardQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # mismo orden que CardAdmin.ordering -> el changelist no ordena en memoria
+            models.Index(fields=['type', 'mana_cost', 'name'],
+                         name='card_admin_order_idx'),
+        ]
+        constraints = [
+            # una fila por printing; sin set, una por nombre. 'Shock' y
+            # 'shock' son la misma carta (ver identity_key). Su índice sirve
+            # también la búsqueda por prefijo del autocomplete.
+            models.UniqueConstraint(fields=['name_key', 'set'],
+                                    name='card_unique_printing'),
+            models.UniqueConstraint(fields=['name_key'], condition=models.Q(set__isnull=True),
+                                    name='card_unique_name_without_set'),
+        ]
+
     def __str__(self):
         return f"{self.name}"
 
+    def normalize(self):
+        """Trims name and set, upper-cases the set and fills name_key."""
+        self.name, self.set = printing_key(self.name, self.set)
+        self.name_key = identity_key(self.name, self.set)[0]
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
 
 class Deck(models.Model):
     FORMAT_CHOICES = [
@@ -71,12 +138,18 @@ class Deck(models.Model):
 
     title = models.CharField(max_length=100)
     format = models.CharField(
-        max_length=50, choices=FORMAT_CHOICES, unique=True, default='Jumpstart')
+        max_length=50, choices=FORMAT_CHOICES, default='Jumpstart')
     cards = models.ManyToManyField(Card, related_name='cards_in_deck')
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # DeckAdmin.ordering y DeckListView.ordering
+            models.Index(fields=['-created_at'], name='deck_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -121,3 +194,103 @@ Deck.add_to_class(
     models.ManyToManyField(Card, through=CardInDeck,
                            related_name='decks', blank=True)
 )
+
+
+class DeckRevision(models.Model):
+    """
+    Revisión de un deck. Cada CHECKPOINT_EVERY revisiones se guarda el
+    contenido completo; el resto guarda solo el delta respecto a la anterior.
+
+    `changes` es una lista plana [card_id, valor, card_id, valor, ...]:
+    cantidad total en un checkpoint, cambio de cantidad en un delta.
+    """
+    deck = models.ForeignKey(
+        Deck, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    is_checkpoint = models.BooleanField(default=False)
+    changes = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['deck', 'number'],
+                                    name='deck_revision_unique_number'),
+        ]
+        ordering = ['deck', 'number']
+
+    def __str__(self):
+        return f"{self.deck} r{self.number}"
+
+
+class Job(models.Model):
+    """
+    Trabajo en segundo plano (cola local en la base de datos).
+    Lo ejecutan uno o varios procesos `manage.py run_jobs`; ver cards/jobs.py.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.IntegerField(default=0)  # mayor = antes
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    progress = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # siguiente trabajo: status=queued ORDER BY -priority, id
+            models.Index(fields=['status', '-priority', 'id'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class InventoryItem(models.Model):
+    """Copias físicas que tenemos de una carta (una fila por carta)."""
+    card = models.OneToOneField(
+        Card, on_delete=models.CASCADE, related_name='inventory')
+    quantity = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Inventory item'
+        verbose_name_plural = 'Inventory'
+
+    def __str__(self):
+        return f"{self.card} x{self.quantity}"
+
+
+class CardImage(models.Model):
+    """
+    Copia local de una imagen remota de carta (ver cards/images.py).
+    Los ficheros se guardan por su sha256: varias URLs con la misma imagen
+    comparten fichero.
+    """
+    url = models.URLField(max_length=500, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    ext = models.CharField(max_length=5)
+    size = models.PositiveIntegerField(default=0)  # bytes en disco, miniatura incluida
+    fetched_at = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.digest[:12]}.{self.ext}"
@@ -2,8 +2,40 @@ from mtgsdk import Card, Set
 from datetime import datetime
 import time
 
-# ======= Carga de sets una única vez (lookup O(1)) =======
-ALL_SETS = {s.code: s for s in Set.all()}
+from .catalog import get_catalog
+from .records import CardRecord, SetRecord
+
+# ======= Sets =======
+# Se leen del catálogo mmap (manage.py build_catalog --with-sets), compartido
+# por todos los procesos. La lista completa de la API solo se descarga, una
+# vez por proceso, si no hay catálogo o le falta el set.
+_all_sets = None
+
+
+def load_all_sets() -> dict[str, SetRecord]:
+    """Every set from the API by code, fetched on first use."""
+    global _all_sets
+    if _all_sets is None:
+        # Solo code / name / release_date: los Set completos del SDK no se guardan
+        _all_sets = {s.code: SetRecord.from_sdk(s) for s in Set.all()}
+    return _all_sets
+
+
+def get_set(code: str | None):
+    """
+    Set by code (object with code, name and release_date), or None.
+    Looked up in the card catalog first, then in the API set list.
+    """
+    if not code:
+        return None
+    try:
+        s = get_catalog().get_set(code)
+    except FileNotFoundError:
+        s = None
+    # catálogo sin --with-sets: el set está pero sin nombre ni fecha
+    if s is not None and s.name:
+        return s
+    return load_all_sets().get(code.upper())
 
 
 def _parse_date(d: str | None) -> datetime:
@@ -58,8 +90,8 @@ def get_latest_card(card_name: str, limit: int = 5, startswith: bool = True, ord
 
     t0 = time.perf_counter()
 
-    # 1) Traer candidatos
-    cards = Card.where(name=card_name).all()
+    # 1) Traer candidatos (como CardRecord: los objetos del SDK se descartan)
+    cards = [CardRecord.from_sdk(c) for c in Card.where(name=card_name).all()]
     t1 = time.perf_counter()
     if print_info:
         print(
@@ -68,6 +100,7 @@ def get_latest_card(card_name: str, limit: int = 5, startswith: bool = True, ord
     q = card_name.strip().lower()
 
     # 2) Un pase: quedarnos con la versión más nueva por nombre
+    # {name: (fecha, record)}; los dicts solo se crean para los resultados
     latest_by_name = {}
 
     for c in cards:
@@ -75,37 +108,34 @@ def get_latest_card(card_name: str, limit: int = 5, startswith: bool = True, ord
         if startswith and not name_norm.startswith(q):
             continue
 
-        s = ALL_SETS.get(c.set)
+        s = get_set(c.set)
         rel_dt = _parse_date(s.release_date if s else None)
 
-        info = {
+        prev = latest_by_name.get(c.name)
+        if (prev is None) or (rel_dt > prev[0]):
+            latest_by_name[c.name] = (rel_dt, c)
+
+    # 3) Ordenar según order_by
+    if order_by == "alpha":
+        latest = sorted(latest_by_name.values(),
+                        key=lambda x: x[1].name.lower())
+    else:  # por fecha (default)
+        latest = sorted(latest_by_name.values(),
+                        key=lambda x: x[0], reverse=True)
+
+    # Limitar y montar los dicts de salida
+    results = []
+    for _rel_dt, c in latest[:limit]:
+        s = get_set(c.set)
+        r = {
             "name": c.name,
             "set_name": s.name if s else None,
             "set": c.set,
             "type": c.type,
             "mana_cost": c.mana_cost,
             "release_date": s.release_date if s else None,
-            "_rel_dt": rel_dt,
         }
-
-        prev = latest_by_name.get(c.name)
-        if (prev is None) or (rel_dt > prev["_rel_dt"]):
-            latest_by_name[c.name] = info
-
-    # 3) Ordenar según order_by
-    if order_by == "alpha":
-        results = sorted(latest_by_name.values(),
-                         key=lambda x: x["name"].lower())
-    else:  # por fecha (default)
-        results = sorted(latest_by_name.values(),
-                         key=lambda x: x["_rel_dt"], reverse=True)
-
-    # Limitar
-    results = results[:limit]
-
-    # Limpiar clave interna y mostrar
-    for r in results:
-        r.pop("_rel_dt", None)
+        results.append(r)
         if print_info:
             print(r["name"], ">", r["mana_cost"], ">", r["type"], ">",
                   f'{r["set_name"]} ({r["set"]})', ">", r["release_date"])
@@ -199,6 +229,7 @@ def get_card_by_name_and_set(card_name: str = None, set_code: str = None, set_na
     elif set_name:
         cards = Card.where(name=card_name.lower()).where(
             setName=set_name.lower()).all()
+    cards = [CardRecord.from_sdk(c) for c in cards]
 
     # Comprobar cuantas cartas se han encontrado
     print(
@@ -208,34 +239,8 @@ def get_card_by_name_and_set(card_name: str = None, set_code: str = None, set_na
         print("Double faced card detected. Returning both faces.")
 
         returned_card = {
-            "front": {
-                "name": cards[0].name,
-                "set": cards[0].set,
-                "set_name": cards[0].set_name,
-                "type": cards[0].type,
-                "subtypes": cards[0].subtypes,
-                "mana_cost": cards[0].mana_cost,
-                "text": cards[0].text,
-                "power": cards[0].power,
-                "toughness": cards[0].toughness,
-                "loyalty": cards[0].loyalty,
-                "rarity": cards[0].rarity,
-                "image_url": cards[0].image_url,
-            },
-            "back": {
-                "name": cards[1].name,
-                "set": cards[1].set,
-                "set_name": cards[1].set_name,
-                "type": cards[1].type,
-                "subtypes": cards[0].subtypes,
-                "mana_cost": cards[1].mana_cost,
-                "text": cards[1].text,
-                "power": cards[1].power,
-                "toughness": cards[1].toughness,
-                "loyalty": cards[1].loyalty,
-                "rarity": cards[1].rarity,
-                "image_url": cards[1].image_url,
-            }
+            "front": cards[0].as_dict(),
+            "back": cards[1].as_dict(),
         }
 
         print(returned_card)
@@ -243,20 +248,7 @@ def get_card_by_name_and_set(card_name: str = None, set_code: str = None, set_na
 
     elif len(cards) == 1:
         returned_card = {
-            "front": {
-                "name": cards[0].name,
-                "set": cards[0].set,
-                "set_name": cards[0].set_name,
-                "type": cards[0].type,
-                "subtypes": cards[0].subtypes,
-                "mana_cost": cards[0].mana_cost,
-                "text": cards[0].text,
-                "power": cards[0].power,
-                "toughness": cards[0].toughness,
-                "loyalty": cards[0].loyalty,
-                "rarity": cards[0].rarity,
-                "image_url": cards[0].image_url,
-            },
+            "front": cards[0].as_dict(),
         }
 
         print(returned_card)
@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+
+from .jobs import PROGRESS_INTERVAL
+from .models import Job
+
+# Progreso de trabajos en streaming (Server-Sent Events).
+#
+# Los workers escriben Job.progress en la BD (JobContext.report) y suelen ser
+# otros procesos, así que alguien tiene que leerla. En cada proceso ASGI hay
+# un único sondeo: cada PROGRESS_INTERVAL lee con una sola query todos los
+# trabajos que alguien está mirando y reparte los cambios por colas asyncio.
+# Cien clientes mirando el mismo import cuestan lo mismo que uno.
+
+# Comentario SSE cada tantos segundos sin eventos, para que proxies y
+# navegadores no cierren la conexión
+HEARTBEAT = 15.0
+FINISHED = (Job.DONE, Job.FAILED)
+
+_FIELDS = ('id', 'kind', 'status', 'attempts', 'progress', 'result', 'error')
+
+
+def _read_jobs(pks) -> dict[int, dict]:
+    jobs = {}
+    for row in Job.objects.filter(pk__in=pks).values(*_FIELDS):
+        if row['status'] not in FINISHED:
+            # el resultado y el error de un intento anterior no interesan aún
+            del row['result'], row['error']
+        jobs[row['id']] = row
+    return jobs
+
+
+def _offer(queue: asyncio.Queue, event) -> None:
+    # Nunca bloquea: a un cliente lento le basta con el último estado
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class ProgressHub:
+    """
+    Fans out job progress to any number of watchers in this process.
+
+    Each watcher gets an asyncio.Queue of size one that always holds the
+    latest state of its job (a dict with the _FIELDS, or None if the job
+    was deleted). A single polling task serves every watched job and stops
+    when nobody is watching.
+    """
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL):
+        self.interval = interval
+        self.watchers: dict[int, set[asyncio.Queue]] = {}
+        self.last: dict[int, dict | None] = {}
+        self._task = None
+
+    def subscribe(self, pk: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        self.watchers.setdefault(pk, set()).add(queue)
+        if pk in self.last:
+            queue.put_nowait(self.last[pk])
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, pk: int, queue: asyncio.Queue) -> None:
+        queues = self.watchers.get(pk)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.watchers[pk]
+                self.last.pop(pk, None)
+
+    async def _poll(self):
+        try:
+            while self.watchers:
+                jobs = await sync_to_async(_read_jobs)(list(self.watchers))
+                # durante la query pueden haberse ido clientes
+                for pk, queues in self.watchers.items():
+                    event = jobs.get(pk)
+                    if pk in self.last and self.last[pk] == event:
+                        continue
+                    self.last[pk] = event
+                    for queue in queues:
+                        _offer(queue, event)
+                await asyncio.sleep(self.interval)
+        finally:
+            self._task = None
+
+
+hub = ProgressHub()
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_job_progress(pk: int, heartbeat: float = HEARTBEAT):
+    """
+    Async generator of SSE messages for job `pk`:
+
+    - "progress": status and Job.progress counters (parsed, resolved,
+      upstream_calls, done, total, rate...) every time they change.
+    - "done": final state, with result or error, and the stream ends.
+    - "gone": the job was deleted, and the stream ends.
+    """
+    queue = hub.subscribe(pk)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if event is None:
+                yield _sse('gone', {'id': pk})
+                return
+            if event['status'] in FINISHED:
+                yield _sse('done', event)
+                return
+            yield _sse('progress', event)
+    finally:
+        hub.unsubscribe(pk, queue)
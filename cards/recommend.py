@@ -0,0 +1,281 @@
+import heapq
+import math
+import threading
+from array import array
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+from .deck_diff import load_deck_contents
+
+# Fichero del índice: triples (deck_id, card_id, quantity) int64 ordenados por
+# deck, precedidos de (-1, versión, offset del log cuando se construyó)
+INDEX_FILENAME = 'recommend_index.bin'
+INDEX_VERSION = 1
+# Log de cambios compartido por todos los procesos (web y run_jobs): ids de
+# deck int64 que solo crece. Cada proceso recuerda hasta dónde lo ha leído y
+# recarga de la BD los decks que otros hayan cambiado desde entonces.
+LOG_FILENAME = 'recommend_index.log'
+# En el log: "todo ha cambiado" (clear_index)
+RESET = -1
+
+
+def default_index_path() -> Path:
+    return Path(settings.CARDS_DATA_DIR) / INDEX_FILENAME
+
+
+def default_log_path() -> Path:
+    return Path(settings.CARDS_DATA_DIR) / LOG_FILENAME
+
+
+def _log_size() -> int:
+    try:
+        # solo registros completos: otro proceso puede estar escribiendo
+        return default_log_path().stat().st_size // 8 * 8
+    except FileNotFoundError:
+        return 0
+
+
+class RecommendIndex:
+    """
+    In-memory index for "decks like this" and "cards often played with".
+
+    - Every deck is a sparse {card_id: quantity} vector; similar decks are
+      ranked by cosine similarity, computed only against decks that share
+      at least one card (through the inverted index card -> {deck: qty}).
+    - Card co-occurrence counts how many decks contain both cards.
+
+    Only the deck vectors are persisted (see save()); postings and
+    co-occurrence are derived on load. update_deck() patches a single deck
+    without a rebuild. log_offset is the position in the change log this
+    index is up to date with (see get_index()).
+    """
+
+    def __init__(self):
+        self.vectors = {}                    # deck_id -> {card_id: qty}
+        self.norms = {}                      # deck_id -> ||vector||
+        self.postings = defaultdict(dict)    # card_id -> {deck_id: qty}
+        self.cooccurrence = defaultdict(lambda: defaultdict(int))
+        self.log_offset = 0
+        self._lock = threading.Lock()
+
+    # ======= Construcción =======
+    @classmethod
+    def build(cls) -> 'RecommendIndex':
+        """Builds the index from every CardInDeck row (one query)."""
+        index = cls()
+        # antes de leer la BD: lo que se registre mientras tanto se vuelve a aplicar
+        index.log_offset = _log_size()
+        for deck_id, vector in load_deck_contents().items():
+            index._add(deck_id, vector)
+        return index
+
+    def save(self, path: Path | None = None) -> None:
+        path = Path(path or default_index_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        flat = array('q', (-1, INDEX_VERSION, self.log_offset))
+        for deck_id in sorted(self.vectors):
+            for card_id, qty in sorted(self.vectors[deck_id].items()):
+                flat.extend((deck_id, card_id, qty))
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            flat.tofile(f)
+        tmp.replace(path)  # escritura atómica: los lectores nunca ven un fichero a medias
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> 'RecommendIndex':
+        path = Path(path or default_index_path())
+        flat = array('q')
+        with open(path, 'rb') as f:
+            flat.frombytes(f.read())
+
+        index = cls()
+        start = 0
+        if len(flat) >= 3 and flat[0] == -1:
+            index.log_offset = flat[2]
+            start = 3
+        # ficheros sin cabecera (anteriores al log): se reaplica el log entero
+
+        vectors = defaultdict(dict)
+        for i in range(start, len(flat), 3):
+            vectors[flat[i]][flat[i + 1]] = flat[i + 2]
+        for deck_id, vector in vectors.items():
+            index._add(deck_id, vector)
+        return index
+
+    # ======= Actualización incremental =======
+    def _add(self, deck_id: int, vector: dict[int, int]) -> None:
+        if not vector:
+            return
+        self.vectors[deck_id] = vector
+        self.norms[deck_id] = math.sqrt(sum(q * q for q in vector.values()))
+        cards = list(vector)
+        for card_id, qty in vector.items():
+            self.postings[card_id][deck_id] = qty
+            co = self.cooccurrence[card_id]
+            for other in cards:
+                if other != card_id:
+                    co[other] += 1
+
+    def _remove(self, deck_id: int) -> None:
+        vector = self.vectors.pop(deck_id, None)
+        if vector is None:
+            return
+        del self.norms[deck_id]
+        cards = list(vector)
+        for card_id in cards:
+            holders = self.postings[card_id]
+            del holders[deck_id]
+            if not holders:
+                del self.postings[card_id]
+            co = self.cooccurrence[card_id]
+            for other in cards:
+                if other == card_id:
+                    continue
+                co[other] -= 1
+                if not co[other]:
+                    del co[other]
+            if not co:
+                del self.cooccurrence[card_id]
+
+    def update_deck(self, deck_id: int, vector: dict[int, int] | None) -> None:
+        """
+        Replaces the vector of one deck. Pass None or {} for a deleted deck.
+        Cost is proportional to the deck size squared, not to the index size.
+        """
+        with self._lock:
+            self._remove(deck_id)
+            self._add(deck_id, dict(vector or {}))
+
+    # ======= Consultas =======
+    def similar_decks(self, deck_id: int, k: int = 10) -> list[tuple[int, float]]:
+        """
+        Top-k decks by cosine similarity to `deck_id`.
+
+        Returns:
+            list[tuple[int, float]]: (deck_id, score), best first. Empty if
+            the deck is not in the index.
+        """
+        with self._lock:
+            vector = self.vectors.get(deck_id)
+            if not vector:
+                return []
+            dots = defaultdict(int)
+            for card_id, qty in vector.items():
+                for other, other_qty in self.postings[card_id].items():
+                    if other != deck_id:
+                        dots[other] += qty * other_qty
+            norm = self.norms[deck_id]
+            return heapq.nlargest(
+                k, ((other, dot / (norm * self.norms[other])) for other, dot in dots.items()),
+                key=lambda item: item[1])
+
+    def co_played(self, card_id: int, k: int = 10) -> list[tuple[int, int]]:
+        """
+        Top-k cards that share the most decks with `card_id`.
+
+        Returns:
+            list[tuple[int, int]]: (card_id, number of shared decks), best first.
+        """
+        with self._lock:
+            co = self.cooccurrence.get(card_id)
+            if not co:
+                return []
+            return heapq.nlargest(k, co.items(), key=lambda item: item[1])
+
+
+# ======= Índice compartido por el proceso =======
+_index = None
+_index_lock = threading.Lock()
+
+
+def _load_or_build() -> RecommendIndex:
+    try:
+        return RecommendIndex.load()
+    except FileNotFoundError:
+        return RecommendIndex.build()
+
+
+def _sync(index: RecommendIndex) -> RecommendIndex:
+    """Applies the changes logged by any process since index.log_offset."""
+    size = _log_size()
+    if size == index.log_offset:
+        return index
+    if size < index.log_offset:
+        # alguien borró el log a mano: no se sabe qué cambió. Se reconstruye
+        # de la BD (el fichero puede ser igual de viejo) y el nuevo índice
+        # queda al final del log actual: no se vuelve a recargar en cada llamada.
+        return RecommendIndex.build()
+
+    with open(default_log_path(), 'rb') as f:
+        f.seek(index.log_offset)
+        changed = array('q')
+        changed.frombytes(f.read(size - index.log_offset))
+    if RESET in changed:
+        index = RecommendIndex.build()
+        index.log_offset = max(index.log_offset, size)
+        return index
+
+    # el id se registra tras el commit: la BD ya tiene el cambio
+    deck_ids = set(changed)
+    contents = load_deck_contents(deck_ids)
+    for deck_id in deck_ids:
+        index.update_deck(deck_id, contents.get(deck_id))
+    index.log_offset = size
+    return index
+
+
+def _log(deck_ids) -> None:
+    records = array('q', deck_ids)
+    if not records:
+        return
+    path = default_log_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # una sola escritura en modo append: los registros de varios procesos no se mezclan
+    with open(path, 'ab') as f:
+        f.write(records.tobytes())
+
+
+def get_index() -> RecommendIndex:
+    """
+    Returns the process-wide index, loading it from disk on first use (or
+    building it from the database if the file does not exist yet).
+
+    Decks changed by any process (web, run_jobs workers, commands) are
+    logged by refresh_decks(); every call here first reloads the decks
+    logged since the last one, so the cost of staying fresh is a stat()
+    when nothing changed.
+    """
+    global _index
+    with _index_lock:
+        _index = _sync(_index or _load_or_build())
+    return _index
+
+
+def refresh_deck(deck_id: int) -> None:
+    """Records that one deck changed (see refresh_decks())."""
+    refresh_decks([deck_id])
+
+
+def refresh_decks(deck_ids) -> None:
+    """
+    Records that some decks changed, for every process. The loaded index of
+    this process, if any, is updated right away with a single query.
+    """
+    _log(sorted(set(deck_ids)))
+    if _index is not None:
+        get_index()
+
+
+def clear_index() -> None:
+    """
+    Drops the index of every process and removes the file (e.g. after
+    deleting or restoring every deck): the next get_index() of each
+    process rebuilds it from the database.
+    """
+    global _index
+    _log([RESET])
+    with _index_lock:
+        default_index_path().unlink(missing_ok=True)
+        _index = None
@@ -0,0 +1,69 @@
+from sys import intern
+
+
+def _intern(value):
+    return intern(value) if value else value
+
+
+class CardRecord:
+    """
+    Compact card returned by the SDK layer (cards/mtg_sdk.py).
+
+    Keeps only the fields the app uses, in __slots__ (no per-instance
+    __dict__). Set codes, set names, types, subtypes and rarities repeat
+    across thousands of cards, so they are interned and every record
+    points to the same string object.
+    """
+    __slots__ = ('name', 'set', 'set_name', 'type', 'subtypes', 'mana_cost', 'text',
+                 'power', 'toughness', 'loyalty', 'rarity', 'image_url')
+
+    def __init__(self, name, set=None, set_name=None, type=None, subtypes=None,
+                 mana_cost=None, text=None, power=None, toughness=None, loyalty=None,
+                 rarity=None, image_url=None):
+        self.name = name
+        self.set = _intern(set)
+        self.set_name = _intern(set_name)
+        self.type = _intern(type)
+        # None (sin subtipos en la API) se conserva, como en el SDK
+        self.subtypes = tuple(intern(s) for s in subtypes) if subtypes is not None else None
+        self.mana_cost = _intern(mana_cost)
+        self.text = text
+        self.power = power
+        self.toughness = toughness
+        self.loyalty = loyalty
+        self.rarity = _intern(rarity)
+        self.image_url = image_url
+
+    @classmethod
+    def from_sdk(cls, card) -> 'CardRecord':
+        """Copies the used fields of an mtgsdk.Card (or any object with them)."""
+        return cls(card.name, card.set, card.set_name, card.type, card.subtypes,
+                   card.mana_cost, card.text, card.power, card.toughness, card.loyalty,
+                   card.rarity, card.image_url)
+
+    def as_dict(self) -> dict:
+        """Same dict shape the SDK functions have always returned."""
+        data = {field: getattr(self, field) for field in self.__slots__}
+        if self.subtypes is not None:
+            data['subtypes'] = list(self.subtypes)
+        return data
+
+    def __repr__(self):
+        return f"CardRecord({self.name!r}, {self.set!r})"
+
+
+class SetRecord:
+    """Compact set: only code, name and release date (see CardRecord)."""
+    __slots__ = ('code', 'name', 'release_date')
+
+    def __init__(self, code, name=None, release_date=None):
+        self.code = _intern(code)
+        self.name = _intern(name)
+        self.release_date = release_date
+
+    @classmethod
+    def from_sdk(cls, s) -> 'SetRecord':
+        return cls(s.code, s.name, s.release_date)
+
+    def __repr__(self):
+        return f"SetRecord({self.code!r})"
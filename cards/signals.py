@@ -0,0 +1,31 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CardInDeck
+from . import recommend
+
+# Decks cambiados en la transacción en curso de cada hilo
+_local = threading.local()
+
+
+def _refresh_changed_decks():
+    deck_ids = getattr(_local, 'deck_ids', None)
+    if deck_ids:
+        _local.deck_ids = set()
+        recommend.refresh_decks(deck_ids)
+
+
+@receiver(post_save, sender=CardInDeck)
+@receiver(post_delete, sender=CardInDeck)
+def card_in_deck_changed(sender, instance, **kwargs):
+    # El inline del admin guarda varias filas seguidas: se junta todo y el
+    # primer callback tras el commit refresca cada deck una sola vez (los
+    # demás no encuentran nada). Si la transacción se deshace, sus ids se
+    # refrescan con el siguiente commit, lo que no cambia nada.
+    if not hasattr(_local, 'deck_ids'):
+        _local.deck_ids = set()
+    _local.deck_ids.add(instance.deck_id)
+    transaction.on_commit(_refresh_changed_decks)
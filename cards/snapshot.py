@@ -0,0 +1,209 @@
+import datetime
+import gzip
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+
+from . import recommend
+from .models import Card, CardInDeck, Deck, DeckRevision, InventoryItem, identity_key
+
+# Formato: gzip de líneas JSON.
+#   {"format": "cards-snapshot", "version": 1}
+#   {"table": "card", "columns": [...], "rows": N}
+#   [v1, v2, ...]      <- N filas como arrays, en el orden de "columns"
+#   {"table": "deck", ...}
+#
+# Tablas en orden de dependencias (las FKs apuntan siempre hacia atrás).
+SNAPSHOT_MODELS = [Card, Deck, CardInDeck, DeckRevision, InventoryItem]
+FORMAT = 'cards-snapshot'
+VERSION = 1
+BATCH_SIZE = 5000
+
+
+
+class _SnapshotEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder recorta los datetimes a milisegundos
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+_encoder = _SnapshotEncoder(separators=(',', ':'))
+
+
+def _columns(model):
+    return [f for f in model._meta.concrete_fields]
+
+
+def export_snapshot(path, models_=None) -> dict[str, int]:
+    """
+    Streams the tables to a gzip JSON-lines archive, one array per row,
+    without instantiating models.
+
+    Returns:
+        dict[str, int]: Rows written per model.
+    """
+    models_ = models_ or SNAPSHOT_MODELS
+    counts = {}
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        f.write(_encoder.encode({'format': FORMAT, 'version': VERSION}) + '\n')
+        for model in models_:
+            fields = _columns(model)
+            qs = model._default_manager.order_by('pk')
+            f.write(_encoder.encode({
+                'table': model._meta.model_name,
+                'columns': [field.attname for field in fields],
+                'rows': qs.count(),
+            }) + '\n')
+            n = 0
+            for row in qs.values_list(*[field.attname for field in fields]).iterator(chunk_size=BATCH_SIZE):
+                f.write(_encoder.encode(row) + '\n')
+                n += 1
+            counts[model._meta.model_name] = n
+    return counts
+
+
+def _converter(field):
+    """Turns a JSON value back into what the database expects for `field`."""
+    if isinstance(field, models.DateTimeField):
+        # camino rápido: el archivo guarda isoformat() completo
+        parse, adapt = datetime.datetime.fromisoformat, connection.ops.adapt_datetimefield_value
+        return lambda v: None if v is None else adapt(parse(v))
+    if isinstance(field, (models.DateField, models.TimeField,
+                          models.DecimalField, models.UUIDField)):
+        return lambda v: None if v is None else field.get_db_prep_save(field.to_python(v), connection)
+    if isinstance(field, models.JSONField):
+        return lambda v: field.get_db_prep_save(v, connection)
+    return None
+
+
+def _secondary_indexes(cursor, table: str) -> list[tuple[str, str]]:
+    """
+    (name, CREATE INDEX sql) of the indexes of `table` that can be dropped
+    and rebuilt: everything but the primary key and indexes that back a
+    constraint declared in the table itself.
+    """
+    if connection.vendor == 'sqlite':
+        cursor.execute("SELECT name, sql FROM sqlite_master "
+                       "WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL", [table])
+        return cursor.fetchall()
+    if connection.vendor == 'postgresql':
+        cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+                       "AND indexname NOT IN (SELECT conname FROM pg_constraint)", [table])
+        return cursor.fetchall()
+    return []
+
+
+def restore_snapshot(path, replace: bool = False) -> dict[str, int]:
+    """
+    Restores an archive written by export_snapshot() in a single transaction:
+    plain executemany INSERTs in batches, with the secondary indexes of
+    each table (SQLite, PostgreSQL) dropped before loading and rebuilt
+    once at the end.
+
+    Args:
+        path: Archive to read.
+        replace (bool): Empty the tables first. Otherwise rows are added and
+            clashing ids fail the whole restore.
+
+    Returns:
+        dict[str, int]: Rows restored per model.
+    """
+    by_name = {model._meta.model_name: model for model in SNAPSHOT_MODELS}
+    qn = connection.ops.quote_name
+    counts = {}
+    restored_decks = set()
+
+    # Las FKs se comprueban una sola vez al final (check_constraints) en vez de
+    # fila a fila. En SQLite solo se pueden desactivar fuera de la transacción.
+    with gzip.open(path, 'rt', encoding='utf-8') as f, \
+            connection.constraint_checks_disabled(), transaction.atomic():
+        header = json.loads(f.readline())
+        if header.get('format') != FORMAT or header.get('version') != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} cards snapshot.")
+
+        with connection.cursor() as cursor:
+            # Índices fuera durante la carga (y el borrado); se rehacen una vez al final
+            dropped = []
+            for model in SNAPSHOT_MODELS:
+                for name, create_sql in _secondary_indexes(cursor, model._meta.db_table):
+                    cursor.execute(f'DROP INDEX {qn(name)}')
+                    dropped.append(create_sql)
+
+            if replace:
+                for model in reversed(SNAPSHOT_MODELS):
+                    qs = model._default_manager.all()
+                    qs._raw_delete(qs.db)
+
+            line = f.readline()
+            while line:
+                table = json.loads(line)
+                model = by_name[table['table']]
+                by_attname = {field.attname: field for field in _columns(model)}
+                fields = [by_attname[name] for name in table['columns']]
+                # archivos de antes de Card.name_key: se calcula al cargar
+                derive_key = model is Card and 'name_key' not in table['columns']
+                if derive_key:
+                    name_i, set_i = table['columns'].index('name'), table['columns'].index('set')
+                    fields.append(by_attname['name_key'])
+                converters = [(i, c) for i, c in enumerate(map(_converter, fields)) if c]
+                # decks que cambian: para el índice de recomendaciones
+                deck_column = {Deck: 'id', CardInDeck: 'deck_id'}.get(model)
+                if deck_column:
+                    deck_i = table['columns'].index(deck_column)
+                sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+                    qn(model._meta.db_table),
+                    ', '.join(qn(field.column) for field in fields),
+                    ', '.join(['%s'] * len(fields)))
+
+                left = table['rows']
+                while left:
+                    # un json.loads por lote en vez de uno por fila
+                    lines = list(islice(f, min(left, BATCH_SIZE)))
+                    left -= len(lines)
+                    batch = json.loads('[' + ','.join(lines) + ']')
+                    for row in batch:
+                        for i, convert in converters:
+                            row[i] = convert(row[i])
+                        if derive_key:
+                            row.append(identity_key(row[name_i], row[set_i])[0])
+                    cursor.executemany(sql, batch)
+                    if deck_column:
+                        restored_decks.update(row[deck_i] for row in batch)
+                counts[model._meta.model_name] = table['rows']
+                line = f.readline()
+
+            # un índice UNIQUE falla aquí si el archivo trae duplicados: rollback completo
+            for create_sql in dropped:
+                cursor.execute(create_sql)
+
+            connection.check_constraints(
+                table_names=[model._meta.db_table for model in SNAPSHOT_MODELS])
+
+            # PostgreSQL & co.: que los próximos ids sigan tras los restaurados
+            for sql in connection.ops.sequence_reset_sql(no_style(), SNAPSHOT_MODELS):
+                cursor.execute(sql)
+
+        # los INSERT no pasan por las señales: con replace cambia todo, si no
+        # basta con registrar los decks restaurados
+        if replace:
+            transaction.on_commit(recommend.clear_index)
+        else:
+            transaction.on_commit(lambda: recommend.refresh_decks(restored_decks))
+    return counts
+
+
+def load_fixture(name: str) -> dict[str, int]:
+    """
+    Restores a snapshot as test data, e.g. in TestCase.setUpTestData().
+    `name` is a path, or a file name under cards/fixtures/.
+    """
+    path = Path(name)
+    if not path.exists():
+        path = Path(__file__).resolve().parent / 'fixtures' / name
+    return restore_snapshot(path)
@@ -0,0 +1,125 @@
+import re
+from collections import Counter
+
+from django.db import transaction
+
+from . import recommend
+from .bulk import _raw_delete
+from .history import record_revision
+from .identity import CardIdentityMap
+from .jobs import enqueue, job
+from .models import Card, CardInDeck, Deck
+
+# "4 Shock (M10)", "4x Shock", "Shock"
+_DECKLIST_LINE = re.compile(r'^\s*(?:(\d+)x?\s+)?(.+?)\s*(?:\((\w+)\))?\s*$')
+
+
+def parse_decklist(lines) -> Counter:
+    """
+    Parses decklist lines into {(name, set code or None): quantity}.
+    Blank lines and comments ('#', '//') are skipped.
+    """
+    cards = Counter()
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith(('#', '//')):
+            continue
+        match = _DECKLIST_LINE.match(line)
+        if match:
+            quantity, name, set_code = match.groups()
+            cards[(name, set_code)] += int(quantity or 1)
+    return cards
+
+
+@job('import_decklist')
+def import_decklist(ctx, payload):
+    """
+    Payload: {"deck": id, "lines": ["4 Shock (M10)", ...], "replace": false}
+
+    Unknown printings are created with just name and set and a
+    refresh_cards job is queued to fill them from the API.
+    """
+    deck = Deck.objects.get(pk=payload['deck'])
+    lines = payload['lines']
+    cards = parse_decklist(lines)
+    ctx.report(force=True, parsed=len(lines), total=len(cards), done=0)
+
+    identity = CardIdentityMap.for_names(name for name, _set in cards)
+    for name, set_code in cards:
+        identity.add(name, set_code)
+    created = identity.flush()
+    ctx.report(force=True, done=len(cards), resolved=len(cards), created=created)
+
+    quantities = Counter()
+    for (name, set_code), quantity in cards.items():
+        card_id = identity.get(name, set_code)
+        if card_id is None:
+            raise ValueError(f"Could not resolve the printing {name!r} ({set_code or 'no set'}).")
+        quantities[card_id] += quantity
+
+    with transaction.atomic():
+        if payload.get('replace'):
+            # un DELETE sin Collector ni post_delete por fila (ver cards/bulk.py):
+            # el índice se refresca una vez tras el commit
+            _raw_delete(CardInDeck.objects.filter(deck=deck).exclude(card_id__in=quantities))
+        existing = dict(CardInDeck.objects.filter(deck=deck, card_id__in=quantities)
+                        .values_list('card_id', 'quantity'))
+        if not payload.get('replace'):
+            quantities.update(existing)
+        CardInDeck.objects.bulk_create(
+            [CardInDeck(deck=deck, card_id=card_id, quantity=quantity)
+             for card_id, quantity in quantities.items()],
+            update_conflicts=True, unique_fields=['deck', 'card'], update_fields=['quantity'])
+        record_revision(deck)
+    transaction.on_commit(lambda: recommend.refresh_deck(deck.pk))
+
+    if created:
+        new_ids = list(Card.objects.filter(
+            id__in=quantities, type__isnull=True).values_list('id', flat=True))
+        enqueue('refresh_cards', {'card_ids': new_ids}, priority=-1)
+    return {'cards': len(quantities), 'created': created}
+
+
+@job('refresh_cards')
+def refresh_cards(ctx, payload):
+    """
+    Payload: {"card_ids": [...]} (optional; default every card).
+    Refreshes type, mana cost, rarity, text and image from the API.
+    """
+    from .mtg_sdk import get_card_by_name_and_set  # mtgsdk solo hace falta aquí
+
+    cards = Card.objects.order_by('id')
+    if payload.get('card_ids'):
+        cards = cards.filter(id__in=payload['card_ids'])
+    total = cards.count()
+    ctx.report(force=True, total=total, done=0, upstream_calls=0)
+
+    updated = []
+    for i, card in enumerate(cards.iterator(), start=1):
+        if card.set:
+            data = get_card_by_name_and_set(card_name=card.name, set_code=card.set)
+            ctx.add(upstream_calls=1)
+            front = data and data['front']
+            if front:
+                card.type = front['type']
+                card.subtypes = ', '.join(front['subtypes'] or []) or None
+                card.mana_cost = front['mana_cost']
+                card.rarity = front['rarity']
+                card.box_description = front['text']
+                card.image_url = front['image_url']
+                updated.append(card)
+        ctx.report(done=i)
+
+    Card.objects.bulk_update(
+        updated, ['type', 'subtypes', 'mana_cost', 'rarity', 'box_description', 'image_url'],
+        batch_size=500)
+    ctx.report(force=True, done=total, updated=len(updated))
+    return {'updated': len(updated), 'total': total}
+
+
+@job('rebuild_stats')
+def rebuild_stats(ctx, payload):
+    """Rebuilds the recommendation index and writes it to disk."""
+    index = recommend.RecommendIndex.build()
+    index.save()
+    ctx.report(force=True, done=len(index.vectors), total=len(index.vectors))
+    return {'decks': len(index.vectors), 'cards': len(index.postings)}
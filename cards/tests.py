@@ -1,3 +1,1028 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib.util
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import zlib
+from collections import Counter
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import combinations
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import catalog, history, images, progress, recommend
+from .admin import EstimatedCountPaginator
+from .analytics import LAND, exact_odds, goldfish, hypergeom_at_least, multi_hypergeom_at_least
+from .bulk import clear_deck, delete_all_decks, delete_cards, prune_orphan_cards
+from .deck_diff import diff_contents, diff_decks, jaccard, load_deck_contents, similarity_matrix
+from .history import CHECKPOINT_EVERY, diff_revisions, get_revision, record_deltas, record_revision
+from .identity import CardIdentityMap, merge_duplicate_cards
+from .inventory import buildable_together, deck_buildability, missing_for_decks
+from .jobs import (HANDLERS, RETRY_DELAY, STALE_AFTER, claim_next, enqueue, requeue_stale,
+                   run_job, work)
+from .jumpstart import BASIC_LANDS, PACK_SIZE, THEMES, PackPool, card_theme, generate_packs
+from .models import Card, CardImage, CardInDeck, Deck, DeckRevision, InventoryItem, Job
+from .progress import ProgressHub, stream_job_progress
+from .records import CardRecord
+from .snapshot import SNAPSHOT_MODELS, export_snapshot, load_fixture, restore_snapshot
+from .tasks import import_decklist
 
 # Create your tests here.
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def test_sqlite_count_is_exact_after_deletes(self):
+        Card.objects.bulk_create([Card(name=f'Card {i}') for i in range(30)])
+        delete_cards(Card.objects.filter(name__in=[f'Card {i}' for i in range(20)])
+                     .values_list('id', flat=True))
+        paginator = EstimatedCountPaginator(Card.objects.order_by('id'), 10)
+        self.assertEqual(paginator.count, 10)
+        self.assertEqual(paginator.num_pages, 1)
+
+
+class CardAutocompleteTests(TestCase):
+    def test_prefix_search_is_case_insensitive_beyond_ascii(self):
+        Card.objects.bulk_create([Card(name='Æther Vial', set='DST'), Card(name='Aether Hub'),
+                                  Card(name='Ætherize'), Card(name='Æther Vial', set='A25'),
+                                  Card(name='Shock')])
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'x'))
+
+        def search(term):
+            response = self.client.get('/admin/autocomplete/', {
+                'term': term, 'app_label': 'cards', 'model_name': 'cardindeck',
+                'field_name': 'card'})
+            self.assertEqual(response.status_code, 200)
+            return [result['text'] for result in response.json()['results']]
+
+        self.assertEqual(search('æther'), ['Æther Vial', 'Æther Vial', 'Ætherize'])
+        self.assertEqual(search(' ÆTHER V'), ['Æther Vial', 'Æther Vial'])
+        self.assertEqual(search('aether'), ['Aether Hub'])
+
+
+def make_deck(title, cards, format='Jumpstart'):
+    """Deck with {card: quantity}, saved without signals (bulk_create)."""
+    deck = Deck(title=title, format=format)
+    deck.save()
+    CardInDeck.objects.bulk_create(
+        [CardInDeck(deck=deck, card=card, quantity=qty) for card, qty in cards.items()])
+    return deck
+
+
+class DataDirMixin:
+    """Runs each test with an empty CARDS_DATA_DIR and no loaded recommend index."""
+
+    def setUp(self):
+        super().setUp()
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+        override = override_settings(CARDS_DATA_DIR=data_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        recommend._index = None
+        self.addCleanup(setattr, recommend, '_index', None)
+
+
+class RecommendIndexTests(DataDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.a, self.b, self.c = Card.objects.bulk_create(
+            [Card(name='Shock'), Card(name='Lightning Bolt'), Card(name='Giant Growth')])
+        self.deck = make_deck('Burn', {self.a: 4, self.b: 4})
+
+    def test_changes_logged_by_other_processes_are_applied(self):
+        recommend.get_index().save()
+        self.assertEqual(recommend.get_index().similar_decks(self.deck.pk), [])
+
+        # un worker (sin índice cargado) importa un deck parecido
+        web_index, recommend._index = recommend._index, None
+        other = make_deck('Burn 2', {self.a: 4, self.c: 2})
+        recommend.refresh_decks([other.pk])
+        recommend._index = web_index
+
+        self.assertEqual([d for d, _ in recommend.get_index().similar_decks(self.deck.pk)],
+                         [other.pk])
+        # y tras reiniciar, el fichero de la última build + el log
+        recommend._index = None
+        self.assertEqual([d for d, _ in recommend.get_index().similar_decks(self.deck.pk)],
+                         [other.pk])
+
+    def test_clear_index_empties_other_processes(self):
+        recommend.get_index()
+        web_index, recommend._index = recommend._index, None
+        CardInDeck.objects.all()._raw_delete('default')
+        recommend.clear_index()
+        recommend._index = web_index
+        self.assertEqual(recommend.get_index().vectors, {})
+
+    def test_row_saves_refresh_each_deck_once_per_transaction(self):
+        cards = Card.objects.bulk_create([Card(name=f'Card {i}') for i in range(60)])
+        other = make_deck('Other', {})
+        with mock.patch.object(recommend, 'refresh_decks') as refresh, \
+                self.captureOnCommitCallbacks(execute=True):
+            # como el inline del admin: una fila cada vez
+            for card in cards:
+                CardInDeck(deck=self.deck, card=card, quantity=2).save()
+            CardInDeck(deck=other, card=cards[0]).save()
+            CardInDeck.objects.get(deck=self.deck, card=cards[1]).delete()
+        refresh.assert_called_once_with({self.deck.pk, other.pk})
+
+    def test_shrunk_log_is_not_reloaded_on_every_call(self):
+        recommend.refresh_decks([self.deck.pk] * 3)
+        recommend.get_index().save()
+        recommend._index = None
+        recommend.default_log_path().write_bytes(b'')  # alguien borra el log
+
+        with mock.patch.object(recommend.RecommendIndex, 'build',
+                               wraps=recommend.RecommendIndex.build) as build, \
+                mock.patch.object(recommend.RecommendIndex, 'load',
+                                  wraps=recommend.RecommendIndex.load) as load:
+            for _ in range(3):
+                self.assertEqual(set(recommend.get_index().vectors), {self.deck.pk})
+        self.assertEqual((load.call_count, build.call_count), (1, 1))
+        self.assertEqual(recommend.get_index().log_offset, 0)
+
+    def test_top_k_must_be_an_integer(self):
+        self.assertEqual(self.client.get(f'/decks/{self.deck.pk}/similar/?k=abc').status_code, 400)
+        self.assertEqual(self.client.get(f'/decks/cards/{self.a.pk}/co-played/?k=x').status_code, 400)
+        response = self.client.get(f'/decks/cards/{self.a.pk}/co-played/?k=0')
+        self.assertEqual(response.json()['co_played'], [{'card': self.b.pk, 'name': 'Lightning Bolt', 'decks': 1}])
+
+
+def legacy_card(name, set_code=None):
+    """Card row as code before name_key could store it: not normalized."""
+    card = Card.objects.create(name=f'Legacy {Card.objects.count()}')
+    Card.objects.filter(pk=card.pk).update(name=name, set=set_code, name_key=name.lower())
+    card.name, card.set = name, set_code
+    return card
+
+
+class CardIdentityTests(DataDirMixin, TestCase):
+    def test_dedupe_cards_merges_duplicates(self):
+        shock, bolt = Card.objects.bulk_create([Card(name='Shock', set='M10'), Card(name='Bolt')])
+        dup = legacy_card(' Shock', 'm10')
+        deck = make_deck('Burn', {shock: 2, dup: 1, bolt: 4})
+        other = make_deck('Shocks', {dup: 3})
+
+        call_command('dedupe_cards', stdout=open(os.devnull, 'w'))
+
+        self.assertQuerySetEqual(Card.objects.order_by('id').values_list('name', 'set'),
+                                 [('Shock', 'M10'), ('Bolt', None)])
+        self.assertEqual(dict(deck.card_links.values_list('card_id', 'quantity')),
+                         {shock.pk: 3, bolt.pk: 4})
+        self.assertEqual(dict(other.card_links.values_list('card_id', 'quantity')), {shock.pk: 3})
+        self.assertEqual(DeckRevision.objects.filter(deck__in=[deck, other]).count(), 2)
+
+    def test_dedupe_cards_merges_inventory(self):
+        shock, bolt = Card.objects.bulk_create([Card(name='Shock', set='M10'), Card(name='Bolt')])
+        dup, dup2 = legacy_card('Shock ', 'M10'), legacy_card(' Shock', 'm10')
+        InventoryItem.objects.bulk_create([InventoryItem(card=dup, quantity=2),
+                                           InventoryItem(card=dup2, quantity=1),
+                                           InventoryItem(card=bolt, quantity=4)])
+        merge_duplicate_cards()
+        self.assertEqual(dict(InventoryItem.objects.values_list('card_id', 'quantity')),
+                         {shock.pk: 3, bolt.pk: 4})
+
+        dup = legacy_card('Shock ', 'M10')
+        InventoryItem.objects.create(card=dup, quantity=5)
+        merge_duplicate_cards()
+        self.assertEqual(InventoryItem.objects.get(card=shock).quantity, 8)
+        self.assertEqual(InventoryItem.objects.count(), 2)
+
+    def test_names_are_case_insensitive(self):
+        shock = Card.objects.create(name='Shock', set='M10')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Card.objects.bulk_create([Card(name='shock', set='M10')])
+
+        identity = CardIdentityMap.for_names(['SHOCK', 'Giant Growth'])
+        self.assertEqual(identity.add('shock ', 'm10'), shock.pk)
+        self.assertIsNone(identity.add('giant growth', None))
+        self.assertIsNone(identity.add('Giant Growth', None))
+        self.assertEqual(identity.flush(), 1)
+        self.assertEqual(Card.objects.get(pk=identity.get('GIANT GROWTH', None)).name,
+                         'giant growth')
+
+    def test_import_decklist_reuses_existing_spelling(self):
+        shock = Card.objects.create(name='Shock', set='M10')
+        deck = make_deck('Burn', {})
+        import_decklist(_Context(), {'deck': deck.pk, 'lines': ['4 shock (m10)', '2 SHOCK (M10)']})
+        self.assertEqual(Card.objects.count(), 1)
+        self.assertEqual(dict(deck.card_links.values_list('card_id', 'quantity')), {shock.pk: 6})
+
+
+    def test_non_ascii_names(self):
+        vial = Card.objects.create(name='Æther Vial', set='DST')
+        self.assertEqual(vial.name_key, 'æther vial')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Card.objects.bulk_create([Card(name='ÆTHER VIAL', set='dst')])
+
+        deck = make_deck('Artifacts', {})
+        import_decklist(_Context(), {'deck': deck.pk, 'lines': [
+            '4 Æther Vial (DST)', '1 æther vial (dst)', '2 Ætherize', '1 ÆTHERIZE']})
+        new = Card.objects.get(name_key='ætherize')
+        self.assertEqual(new.name, 'Ætherize')
+        self.assertEqual(Card.objects.count(), 2)
+        self.assertEqual(dict(deck.card_links.values_list('card_id', 'quantity')),
+                         {vial.pk: 5, new.pk: 3})
+
+    def test_import_decklist_fails_on_unresolved_printing(self):
+        deck = make_deck('Burn', {})
+        with mock.patch.object(CardIdentityMap, 'flush', return_value=0), \
+                self.assertRaisesMessage(ValueError, "'Shock' (M10)"):
+            import_decklist(_Context(), {'deck': deck.pk, 'lines': ['4 Shock (M10)']})
+        self.assertFalse(deck.card_links.exists())
+
+
+class JobQueueTests(DataDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        calls = self.calls = []
+
+        def ok(ctx, payload):
+            calls.append(payload)
+            ctx.report(force=True, done=1, total=1)
+            return {'echo': payload}
+
+        def broken(ctx, payload):
+            raise RuntimeError('upstream is down')
+
+        handlers = mock.patch.dict(HANDLERS, {'ok': ok, 'broken': broken})
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    def test_claim_order(self):
+        low = enqueue('ok', priority=0)
+        high = enqueue('ok', priority=5)
+        later = enqueue('ok', priority=10, run_after=timezone.now() + timedelta(hours=1))
+        other = enqueue('broken', priority=1)
+        due = enqueue('ok', priority=0, run_after=timezone.now() - timedelta(seconds=1))
+
+        claimed = claim_next('w1', kinds=['ok'])
+        self.assertEqual((claimed.pk, claimed.status, claimed.locked_by), (high.pk, Job.RUNNING, 'w1'))
+        self.assertEqual(claim_next('w2').pk, other.pk)
+        self.assertEqual([claim_next('w2').pk, claim_next('w2').pk], [low.pk, due.pk])
+        self.assertIsNone(claim_next('w2'))
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.QUEUED)
+
+    def test_claim_skips_jobs_taken_meanwhile(self):
+        first, second = enqueue('ok'), enqueue('ok')
+        real_filter = Job.objects.filter
+
+        def racing_filter(*args, **kwargs):
+            # otro worker se lleva el primero entre la lectura y el UPDATE
+            if kwargs.get('pk') == first.pk and kwargs.get('status') == Job.QUEUED:
+                real_filter(pk=first.pk).update(status=Job.RUNNING, locked_by='other')
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(Job.objects, 'filter', side_effect=racing_filter):
+            claimed = claim_next('w1')
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual(Job.objects.get(pk=first.pk).locked_by, 'other')
+
+    def test_run_done(self):
+        enqueue('ok', {'n': 1})
+        job_obj = run_job(claim_next('w'))
+        self.assertEqual(job_obj.status, Job.DONE)
+        self.assertEqual(job_obj.result, {'echo': {'n': 1}})
+        self.assertEqual((job_obj.progress['done'], job_obj.locked_by, job_obj.locked_at), (1, '', None))
+
+    def test_retry_backoff_then_failed(self):
+        enqueue('broken', max_attempts=3)
+        for attempt, delay in [(1, RETRY_DELAY), (2, RETRY_DELAY * 2)]:
+            before = timezone.now()
+            job_obj = run_job(claim_next('w'))
+            self.assertEqual((job_obj.status, job_obj.attempts), (Job.QUEUED, attempt))
+            self.assertIn('upstream is down', job_obj.error)
+            self.assertGreaterEqual(job_obj.run_after, before + delay)
+            self.assertLessEqual(job_obj.run_after, timezone.now() + delay)
+            # no vuelve a salir hasta que pase la espera
+            self.assertIsNone(claim_next('w'))
+            Job.objects.filter(pk=job_obj.pk).update(run_after=timezone.now())
+
+        job_obj = run_job(claim_next('w'))
+        self.assertEqual((job_obj.status, job_obj.attempts), (Job.FAILED, 3))
+        self.assertIn('RuntimeError', job_obj.error)
+        self.assertIsNone(claim_next('w'))
+
+    def test_unknown_kind_fails_at_once(self):
+        enqueue('no_such_kind', max_attempts=3)
+        job_obj = run_job(claim_next('w'))
+        self.assertEqual((job_obj.status, job_obj.attempts), (Job.FAILED, 1))
+        self.assertIn('Unknown job kind: no_such_kind', job_obj.error)
+
+    def test_requeue_stale(self):
+        stale, fresh = enqueue('ok'), enqueue('ok')
+        claim_next('w'), claim_next('w')
+        Job.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - STALE_AFTER * 2)
+
+        self.assertEqual(requeue_stale(), 1)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by, stale.locked_at), (Job.QUEUED, '', None))
+        self.assertEqual(Job.objects.get(pk=fresh.pk).status, Job.RUNNING)
+
+    def test_work_once_runs_the_queue(self):
+        enqueue('ok', {'n': 1}), enqueue('ok', {'n': 2}, priority=1)
+        self.assertEqual(work(once=True), 2)
+        self.assertEqual(self.calls, [{'n': 2}, {'n': 1}])
+
+    def test_import_decklist_replace_refreshes_once(self):
+        cards = Card.objects.bulk_create([Card(name=f'Card {i}') for i in range(5)])
+        deck = make_deck('Pile', {card: 1 for card in cards})
+        with mock.patch.object(recommend, 'refresh_decks') as refresh, \
+                self.captureOnCommitCallbacks(execute=True):
+            import_decklist(_Context(), {'deck': deck.pk, 'lines': ['3 Card 0'], 'replace': True})
+        refresh.assert_called_once_with([deck.pk])
+        self.assertEqual(dict(deck.card_links.values_list('card_id', 'quantity')), {cards[0].pk: 3})
+
+
+class ProgressStreamTests(TestCase):
+    def setUp(self):
+        self.hub = ProgressHub(interval=0.01)
+        patcher = mock.patch.object(progress, 'hub', self.hub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def next_event(self, stream):
+        message = await asyncio.wait_for(anext(stream), 5)
+        if message.startswith(':'):
+            return 'comment', message
+        event, data = message.strip().split('\n')
+        return event.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+    async def wait_idle(self):
+        for _ in range(100):
+            if self.hub._task is None:
+                return
+            await asyncio.sleep(0.01)
+        self.fail("the poll task did not stop")
+
+    async def test_progress_then_done(self):
+        job_obj = await Job.objects.acreate(kind='import_decklist', status=Job.RUNNING,
+                                            progress={'done': 1, 'total': 3}, error='old try')
+        streams = [stream_job_progress(job_obj.pk) for _ in range(20)]
+        for stream in streams:
+            event, data = await self.next_event(stream)
+            self.assertEqual((event, data['progress']), ('progress', {'done': 1, 'total': 3}))
+            self.assertNotIn('error', data)
+        # un único sondeo para todos los clientes
+        self.assertEqual(set(self.hub.watchers), {job_obj.pk})
+        self.assertEqual(len(self.hub.watchers[job_obj.pk]), 20)
+
+        await Job.objects.filter(pk=job_obj.pk).aupdate(progress={'done': 2, 'total': 3})
+        for stream in streams:
+            self.assertEqual((await self.next_event(stream))[1]['progress']['done'], 2)
+
+        await Job.objects.filter(pk=job_obj.pk).aupdate(
+            status=Job.DONE, progress={'done': 3, 'total': 3}, result={'cards': 3}, error='')
+        for stream in streams:
+            event, data = await self.next_event(stream)
+            self.assertEqual((event, data['result']), ('done', {'cards': 3}))
+            with self.assertRaises(StopAsyncIteration):
+                await anext(stream)
+        self.assertEqual(self.hub.watchers, {})
+        await self.wait_idle()
+
+    async def test_deleted_job_is_gone(self):
+        job_obj = await Job.objects.acreate(kind='import_decklist')
+        stream = stream_job_progress(job_obj.pk)
+        self.assertEqual((await self.next_event(stream))[0], 'progress')
+        await Job.objects.filter(pk=job_obj.pk).adelete()
+        self.assertEqual(await self.next_event(stream), ('gone', {'id': job_obj.pk}))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        await self.wait_idle()
+
+    async def test_disconnect_unsubscribes(self):
+        job_obj = await Job.objects.acreate(kind='import_decklist')
+        stream = stream_job_progress(job_obj.pk, heartbeat=0.05)
+        self.assertEqual((await self.next_event(stream))[0], 'progress')
+        # sin cambios: solo comentarios para mantener viva la conexión
+        self.assertEqual(await self.next_event(stream), ('comment', ': keep-alive\n\n'))
+        await stream.aclose()
+        self.assertEqual(self.hub.watchers, {})
+        self.assertEqual(self.hub.last, {})
+        await self.wait_idle()
+
+
+class JumpstartTests(DataDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cards = [Card(name='Mountain', type='Basic Land', set='M21'),
+                 Card(name='Forest', type='Basic Land', set='M21'),
+                 Card(name='Gruul Charm', mana_cost='{R}{G}', rarity='Uncommon'),
+                 Card(name='Sol Ring', mana_cost='{1}', rarity='Uncommon')]
+        for color in 'RG':
+            for rarity, n in (('Common', 15), ('Uncommon', 6), ('Rare', 4), ('Mythic', 2)):
+                cards += [Card(name=f'{color} {rarity} {i}', mana_cost=f'{{1}}{{{color}}}',
+                               rarity=rarity, type='Creature') for i in range(n)]
+        # azul sin raras: no llega a un pack
+        cards += [Card(name=f'U Common {i}', mana_cost='{U}', rarity='Common') for i in range(15)]
+        Card.objects.bulk_create(cards)
+        self.pool = PackPool()
+        self.cards = {card.pk: card for card in Card.objects.all()}
+
+    def contents(self, decks):
+        links = CardInDeck.objects.filter(deck__in=decks).values_list('deck_id', 'card_id', 'quantity')
+        contents = {deck.pk: Counter() for deck in decks}
+        for deck_id, card_id, quantity in links:
+            contents[deck_id][card_id] += quantity
+        return contents
+
+    def test_packs(self):
+        decks = generate_packs(40, seed=3, pool=self.pool)
+        self.assertEqual(self.pool.themes(), ['R', 'G'])
+        self.assertEqual([deck.title for deck in decks[:3]],
+                         ['Jumpstart Red #1', 'Jumpstart Green #2', 'Jumpstart Red #3'])
+        for deck in decks:
+            pack = self.contents([deck])[deck.pk]
+            self.assertEqual(sum(pack.values()), PACK_SIZE)
+            color = 'R' if 'Red' in deck.title else 'G'
+            basic, = [card_id for card_id in pack if self.cards[card_id].type == 'Basic Land']
+            self.assertEqual((self.cards[basic].name, pack.pop(basic)),
+                             (THEMES[color], BASIC_LANDS))
+            # solo cartas del tema, y los huecos de rareza llenos
+            self.assertEqual({card_theme(self.cards[card_id].mana_cost) for card_id in pack}, {color})
+            rarities = Counter()
+            for card_id, quantity in pack.items():
+                rarities[self.cards[card_id].rarity] += quantity
+            self.assertEqual(rarities['Rare'] + rarities['Mythic'], 1)
+            self.assertEqual(rarities['Uncommon'], 3)
+            self.assertEqual(rarities['Common'], PACK_SIZE - BASIC_LANDS - 4)
+
+    def test_same_seed_same_packs(self):
+        first = list(self.contents(generate_packs(10, seed=7, pool=self.pool)).values())
+        again = list(self.contents(generate_packs(10, seed=7, pool=self.pool)).values())
+        other = list(self.contents(generate_packs(10, seed=8, pool=self.pool)).values())
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+
+    def test_one_mythic_in_eight_rare_slots(self):
+        packs, card_ids, quantities = self.pool.sample('R', 8000, np.random.default_rng(1))
+        self.assertEqual(quantities.sum(), 8000 * PACK_SIZE)
+        mythics = sum(int(q) for card_id, q in zip(card_ids.tolist(), quantities)
+                      if self.cards[card_id].rarity == 'Mythic')
+        self.assertAlmostEqual(mythics / 8000, 1 / 8, delta=0.015)
+
+    def test_theme_without_enough_cards(self):
+        with self.assertRaisesMessage(ValueError, "Not enough cards in the pool for theme: U"):
+            generate_packs(2, themes=['R', 'U'], pool=self.pool)
+        self.assertFalse(Deck.objects.exists())
+        with self.assertRaisesMessage(ValueError, "cannot build any Jumpstart theme"):
+            generate_packs(1, pool=PackPool([]))
+
+
+class _Context:
+    """Stand-in for jobs.JobContext."""
+
+    def report(self, force=False, **counters):
+        pass
+
+    def add(self, **counters):
+        pass
+
+
+class DeckDiffTests(TestCase):
+    def setUp(self):
+        c = self.c = Card.objects.bulk_create([Card(name=f'Card {i}') for i in range(6)])
+        self.a = make_deck('A', {c[0]: 2, c[1]: 1, c[2]: 4})
+        self.b = make_deck('B', {c[1]: 3, c[2]: 4, c[3]: 1})
+        self.other = make_deck('Other', {c[4]: 1})
+        self.same = make_deck('Same as A', {c[0]: 1, c[1]: 1, c[2]: 1})
+        self.empty = make_deck('Empty', {})
+        self.empty2 = make_deck('Empty 2', {})
+
+    def test_similarity_matrix_matches_jaccard(self):
+        decks = [self.a, self.b, self.other, self.same, self.empty, self.empty2]
+        contents = load_deck_contents(deck.pk for deck in decks)
+        with self.assertNumQueries(1):
+            ids, matrix = similarity_matrix([deck.pk for deck in reversed(decks)])
+        self.assertEqual(ids, sorted(deck.pk for deck in decks))
+        for i, x in enumerate(ids):
+            for j, y in enumerate(ids):
+                self.assertAlmostEqual(matrix[i][j], jaccard(contents[x].keys(), contents[y].keys()))
+        pos = {deck_id: i for i, deck_id in enumerate(ids)}
+        self.assertAlmostEqual(matrix[pos[self.a.pk]][pos[self.b.pk]], 2 / 4)
+        self.assertEqual(matrix[pos[self.a.pk]][pos[self.same.pk]], 1.0)
+        self.assertEqual(matrix[pos[self.a.pk]][pos[self.empty.pk]], 0.0)
+        self.assertEqual(matrix[pos[self.empty.pk]][pos[self.empty2.pk]], 1.0)
+
+        # sin ids: todos los decks con cartas
+        ids, _matrix = similarity_matrix()
+        self.assertEqual(ids, sorted([self.a.pk, self.b.pk, self.other.pk, self.same.pk]))
+
+    def test_diff_decks(self):
+        c = self.c
+        self.assertEqual(diff_decks(self.a.pk, self.b.pk), {
+            'added': {c[3].pk: 1}, 'removed': {c[0].pk: 2},
+            'changed': {c[1].pk: (1, 3)}, 'similarity': 0.5})
+        self.assertEqual(diff_decks(self.empty.pk, self.empty2.pk)['similarity'], 1.0)
+
+    def test_compare_view(self):
+        for query in ('', 'ids=', f'ids={self.a.pk}', 'ids=1,x', 'ids=1;2'):
+            response = self.client.get(f'/decks/compare/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn('error', response.json())
+
+        c = self.c
+        response = self.client.get(f'/decks/compare/?ids={self.a.pk},{self.b.pk}').json()
+        self.assertEqual(response, {
+            'decks': [self.a.pk, self.b.pk], 'added': {str(c[3].pk): 1},
+            'removed': {str(c[0].pk): 2}, 'changed': {str(c[1].pk): [1, 3]}, 'similarity': 0.5})
+
+        response = self.client.get(
+            f'/decks/compare/?ids={self.b.pk},{self.a.pk},{self.other.pk}').json()
+        self.assertEqual(response['decks'], [self.a.pk, self.b.pk, self.other.pk])
+        self.assertEqual(response['similarity'], [[1.0, 0.5, 0.0], [0.5, 1.0, 0.0], [0.0, 0.0, 1.0]])
+
+
+class DeckHistoryTests(TestCase):
+    def setUp(self):
+        self.cards = Card.objects.bulk_create([Card(name=f'Card {i}') for i in range(6)])
+        self.deck = make_deck('History', {})
+
+    def set_contents(self, contents):
+        CardInDeck.objects.filter(deck=self.deck).delete()
+        CardInDeck.objects.bulk_create(
+            [CardInDeck(deck=self.deck, card_id=card_id, quantity=qty)
+             for card_id, qty in contents.items()])
+
+    def test_rebuild_across_checkpoints(self):
+        expected = {}
+        for n in range(1, CHECKPOINT_EVERY + 6):
+            contents = {card.pk: (n + i) % 4 for i, card in enumerate(self.cards) if (n + i) % 4}
+            self.set_contents(contents)
+            self.assertEqual(record_revision(self.deck).number, n)
+            expected[n] = contents
+
+        checkpoints = set(DeckRevision.objects.filter(deck=self.deck, is_checkpoint=True)
+                          .values_list('number', flat=True))
+        self.assertEqual(checkpoints, {1, CHECKPOINT_EVERY + 1})
+        for n, contents in expected.items():
+            self.assertEqual(get_revision(self.deck.pk, n), contents)
+
+        old, new = 3, CHECKPOINT_EVERY + 4
+        self.assertEqual(diff_revisions(self.deck.pk, old, new),
+                         diff_contents(expected[old], expected[new]))
+        self.assertEqual(diff_revisions(self.deck.pk, new, old),
+                         diff_contents(expected[new], expected[old]))
+
+    def test_diff_cost_does_not_grow_with_distance(self):
+        card = self.cards[0].pk
+        for n in range(1, 5 * CHECKPOINT_EVERY + 4):
+            self.set_contents({card: n})
+            record_revision(self.deck)
+
+        old, new = 3, 5 * CHECKPOINT_EVERY + 2
+        with mock.patch.object(history, '_replay', wraps=history._replay) as replay, \
+                self.assertNumQueries(2):
+            diff = diff_revisions(self.deck.pk, new, old)
+        self.assertEqual(diff['changed'], {card: (new, old)})
+        read = [rev.number for rev in replay.call_args.args[0]]
+        self.assertEqual(read, [1, 2, 3] + list(range(5 * CHECKPOINT_EVERY + 1, new + 1)))
+
+        # en el mismo tramo, una sola pasada
+        with mock.patch.object(history, '_replay', wraps=history._replay) as replay:
+            self.assertEqual(diff_revisions(self.deck.pk, 4, 6)['changed'], {card: (4, 6)})
+        self.assertEqual([rev.number for rev in replay.call_args.args[0]], list(range(1, 7)))
+        self.assertEqual(diff_revisions(self.deck.pk, 7, 7), diff_contents({}, {}))
+
+    def test_unchanged_deck_records_nothing(self):
+        self.set_contents({self.cards[0].pk: 2})
+        record_revision(self.deck)
+        self.assertIsNone(record_revision(self.deck))
+        with self.assertRaises(DeckRevision.DoesNotExist):
+            get_revision(self.deck.pk, 2)
+
+    def test_record_deltas_numbering_and_checkpoint(self):
+        a, b = self.cards[0].pk, self.cards[1].pk
+        contents = {a: 1}
+        self.set_contents(contents)
+        record_revision(self.deck)
+        for n in range(2, CHECKPOINT_EVERY + 3):
+            contents[a] += 1
+            self.set_contents(contents)
+            [revision] = record_deltas({self.deck.pk: {a: 1}, 999_999: {}})
+            self.assertEqual(revision.number, n)
+            self.assertEqual(revision.is_checkpoint, n == CHECKPOINT_EVERY + 1)
+        self.assertEqual(get_revision(self.deck.pk, CHECKPOINT_EVERY + 2), {a: CHECKPOINT_EVERY + 2})
+        self.assertEqual(diff_revisions(self.deck.pk, 1, CHECKPOINT_EVERY + 2)['changed'],
+                         {a: (1, CHECKPOINT_EVERY + 2)})
+        self.assertEqual(record_deltas({self.deck.pk: {}}), [])
+        self.assertNotIn(b, get_revision(self.deck.pk, 5))
+
+
+class ExactOddsTests(TestCase):
+    def test_known_hypergeometric_values(self):
+        # 17 tierras en 40 cartas: P(>= 2 en la mano inicial) = 89.48%
+        self.assertAlmostEqual(hypergeom_at_least(40, 17, 7, 2), 0.8948025, places=6)
+        self.assertAlmostEqual(hypergeom_at_least(60, 4, 7, 1), 0.3994996, places=6)
+        self.assertEqual(hypergeom_at_least(40, 17, 7, 0), 1.0)
+        self.assertEqual(hypergeom_at_least(40, 17, 7, 8), 0.0)
+        self.assertEqual(hypergeom_at_least(0, 0, 7, 1), 0.0)
+
+    def test_multi_hypergeometric_matches_enumeration(self):
+        deck = ['land'] * 4 + ['two'] * 3 + ['other'] * 3
+        hands = list(combinations(range(len(deck)), 4))
+        wanted = sum(1 for hand in hands
+                     if [deck[i] for i in hand].count('land') >= 2
+                     and [deck[i] for i in hand].count('two') >= 1)
+        self.assertAlmostEqual(multi_hypergeom_at_least(10, [(4, 2), (3, 1)], 4),
+                               wanted / len(hands))
+        self.assertEqual(multi_hypergeom_at_least(10, [(4, 2), (3, 1)], 20), 1.0)
+
+    def test_exact_odds(self):
+        cards = [LAND] * 17 + [1] * 4 + [2] * 8 + [3] * 11
+        odds = exact_odds(cards)
+        self.assertAlmostEqual(sum(odds['opening_lands'].values()), 1.0)
+        self.assertAlmostEqual(1 - odds['opening_lands'][0] - odds['opening_lands'][1],
+                               0.8948025, places=6)
+        # en el turno 1 en el play se ven 7 cartas; en el 2, 8
+        self.assertAlmostEqual(odds['land_drop'][1], hypergeom_at_least(40, 17, 7, 1))
+        self.assertAlmostEqual(odds['land_drop'][2], hypergeom_at_least(40, 17, 8, 2))
+        self.assertAlmostEqual(exact_odds(cards, on_the_play=False)['land_drop'][2],
+                               hypergeom_at_least(40, 17, 9, 2))
+        self.assertAlmostEqual(odds['on_curve'][2],
+                               multi_hypergeom_at_least(40, [(17, 2), (8, 1)], 8))
+
+    def test_deck_smaller_than_a_hand(self):
+        odds = exact_odds([LAND, 1, 2], turns=3)
+        self.assertEqual(odds['opening_lands'], {0: 0.0, 1: 1.0, 2: 0.0, 3: 0.0})
+        self.assertEqual(odds['land_drop'], {1: 1.0, 2: 0.0, 3: 0.0})
+        self.assertEqual(odds['on_curve'], {1: 1.0, 2: 0.0, 3: 0.0})
+
+        result = goldfish([LAND, 1, 2], hands=100, turns=3, seed=1)
+        self.assertEqual(result['mana_spent'], {1: 1.0, 2: 0.0, 3: 0.0})
+        self.assertEqual(result['curve_out'], {1: 1.0, 2: 0.0, 3: 0.0})
+
+
+class GoldfishTests(TestCase):
+    def test_agrees_with_exact_odds(self):
+        # con solo tierras y 1-drops, curvar en el turno 1 es tener ambas en la mano
+        cards = [LAND] * 17 + [1] * 23
+        result = goldfish(cards, hands=20_000, seed=1)
+        self.assertAlmostEqual(result['curve_out'][1], exact_odds(cards)['on_curve'][1], delta=0.01)
+        self.assertAlmostEqual(result['mana_spent'][1], exact_odds(cards)['on_curve'][1], delta=0.01)
+
+    def test_same_seed_same_results(self):
+        cards = [LAND] * 17 + [1] * 4 + [2] * 8 + [3] * 11
+        self.assertEqual(goldfish(cards, hands=1000, seed=7), goldfish(cards, hands=1000, seed=7))
+
+    def test_no_land_drop_is_not_on_curve(self):
+        result = goldfish([5] * 40, hands=200, seed=1)
+        self.assertEqual(result['curve_out'], {1: 0.0, 2: 0.0, 3: 0.0, 4: 0.0})
+        self.assertEqual(result['mana_spent'][4], 0.0)
+
+    def test_unspent_mana_is_not_on_curve(self):
+        self.assertEqual(goldfish([LAND] * 40, hands=50, seed=1)['curve_out'][1], 0.0)
+
+    def test_curve_out_only_decreases(self):
+        curve = goldfish([LAND, 1] * 20, hands=2000, seed=1)['curve_out']
+        self.assertGreater(curve[1], 0.5)
+        self.assertEqual(sorted(curve.values(), reverse=True), list(curve.values()))
+
+
+class BulkDeleteTests(DataDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.a, self.b, self.c, self.orphan = Card.objects.bulk_create(
+            [Card(name='A'), Card(name='B'), Card(name='C'), Card(name='Orphan')])
+        self.deck1 = make_deck('One', {self.a: 2, self.b: 1})
+        self.deck2 = make_deck('Two', {self.a: 3, self.c: 4})
+        for deck in (self.deck1, self.deck2):
+            record_revision(deck)
+
+    def last_delta(self, deck):
+        revision = DeckRevision.objects.filter(deck=deck).latest('number')
+        return dict(zip(revision.changes[0::2], revision.changes[1::2]))
+
+    def test_clear_deck(self):
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(6):
+            self.assertEqual(clear_deck(self.deck1.pk), 2)
+        self.assertFalse(self.deck1.card_links.exists())
+        self.assertEqual(self.last_delta(self.deck1), {self.a.pk: -2, self.b.pk: -1})
+        self.assertEqual(get_revision(self.deck1.pk, 2), {})
+        self.assertEqual(self.deck2.card_links.count(), 2)
+
+    def test_delete_cards(self):
+        InventoryItem.objects.create(card=self.a, quantity=5)
+        recommend.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(delete_cards([self.a.pk]), 1)
+        self.assertFalse(Card.objects.filter(pk=self.a.pk).exists())
+        self.assertFalse(InventoryItem.objects.exists())
+        self.assertEqual(self.last_delta(self.deck1), {self.a.pk: -2})
+        self.assertEqual(get_revision(self.deck1.pk, 2), {self.b.pk: 1})
+        self.assertEqual(get_revision(self.deck2.pk, 2), {self.c.pk: 4})
+        self.assertEqual(recommend.get_index().vectors[self.deck2.pk], {self.c.pk: 4})
+
+    def test_delete_all_decks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(delete_all_decks(), 2)
+        self.assertFalse(Deck.objects.exists())
+        self.assertFalse(CardInDeck.objects.exists())
+        self.assertFalse(DeckRevision.objects.exists())
+        self.assertEqual(Card.objects.count(), 4)
+
+    def test_prune_orphan_cards_keeps_owned_cards(self):
+        owned = Card.objects.create(name='Owned')
+        InventoryItem.objects.create(card=owned, quantity=1)
+        self.assertEqual(prune_orphan_cards(), 1)
+        self.assertQuerySetEqual(Card.objects.order_by('name').values_list('name', flat=True),
+                                 ['A', 'B', 'C', 'Owned'])
+
+
+class CatalogTests(DataDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        catalog._catalog = None
+        self.addCleanup(setattr, catalog, '_catalog', None)
+        self.shock, self.bolt = Card.objects.bulk_create(
+            [Card(name='Shock', set='M10', rarity='Common'), Card(name='Lightning Bolt', set='M11')])
+
+    def build(self):
+        catalog.build_catalog(sets=[SimpleNamespace(code='m10', name='Magic 2010',
+                                                    release_date='2009-07-17')])
+
+    def test_lookups(self):
+        self.build()
+        cat = catalog.get_catalog()
+        self.assertEqual(cat.get(self.shock.pk).name, 'Shock')
+        self.assertEqual([c.name for c in cat.search('LIGHT')], ['Lightning Bolt'])
+        self.assertEqual(cat.get_set('M10').name, 'Magic 2010')
+        self.assertIsNone(cat.get_set('M11').name)
+        self.assertEqual([c.name for c in cat.in_set('m11')], ['Lightning Bolt'])
+
+    def test_card_names_falls_back_to_the_database(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(catalog.card_names([self.shock.pk]), {self.shock.pk: 'Shock'})
+        self.build()
+        new = Card.objects.create(name='Giant Growth')
+        with self.assertNumQueries(1):
+            self.assertEqual(catalog.card_names([self.shock.pk, self.bolt.pk, new.pk]),
+                             {self.shock.pk: 'Shock', self.bolt.pk: 'Lightning Bolt',
+                              new.pk: 'Giant Growth'})
+
+    @skipUnless(importlib.util.find_spec('mtgsdk'), "mtgsdk is not installed")
+    def test_sdk_sets_come_from_the_catalog(self):
+        from .mtg_sdk import get_set
+        self.build()
+        self.assertEqual(get_set('M10').release_date, '2009-07-17')
+
+
+class CardRecordTests(TestCase):
+    def test_as_dict_keeps_the_sdk_shape(self):
+        self.assertIsNone(CardRecord('Shock', 'M10', subtypes=None).as_dict()['subtypes'])
+        self.assertEqual(CardRecord('Shock', 'M10', subtypes=[]).as_dict()['subtypes'], [])
+        record = CardRecord('Grizzly Bears', 'M10', type='Creature — Bear', subtypes=['Bear'])
+        self.assertEqual(record.as_dict()['subtypes'], ['Bear'])
+        other = CardRecord('Runeclaw Bear', 'M10', type='Creature — Bear', subtypes=['Bear'])
+        self.assertIs(record.subtypes[0], other.subtypes[0])
+        self.assertIs(record.type, other.type)
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = Card.objects.bulk_create(
+            [Card(name='A'), Card(name='B'), Card(name='C')])
+        InventoryItem.objects.bulk_create([InventoryItem(card=self.a, quantity=4),
+                                           InventoryItem(card=self.b, quantity=2)])
+        self.small = make_deck('Small', {self.a: 2})
+        self.big = make_deck('Big', {self.a: 3, self.b: 2})
+        self.short = make_deck('Short', {self.a: 1, self.c: 2})
+        self.empty = make_deck('Empty', {})
+
+    def test_deck_buildability(self):
+        with self.assertNumQueries(1):
+            decks = {d.pk: (d.total_cards, d.missing) for d in deck_buildability()}
+        self.assertEqual(decks, {self.small.pk: (2, 0), self.big.pk: (5, 0),
+                                 self.short.pk: (3, 2), self.empty.pk: (0, 0)})
+
+    def test_missing_for_decks_shares_the_inventory(self):
+        self.assertEqual(missing_for_decks([self.small.pk, self.big.pk]), {self.a.pk: 1})
+        self.assertEqual(missing_for_decks([self.small.pk]), {})
+
+    def test_buildable_together(self):
+        # Small y Big piden 5 copias de A y hay 4: entra la más pequeña
+        with self.assertNumQueries(3):
+            self.assertEqual(buildable_together(), [self.small.pk])
+        self.assertEqual(buildable_together([self.big.pk, self.short.pk]), [self.big.pk])
+        InventoryItem.objects.filter(card=self.a).update(quantity=5)
+        self.assertEqual(buildable_together(), [self.small.pk, self.big.pk])
+
+
+class SnapshotTests(DataDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        shock, bolt = Card.objects.bulk_create(
+            [Card(name='Shock', set='M10', mana_cost='{R}', type='Instant'), Card(name='Lightning Bolt')])
+        self.shock = shock
+        self.deck = deck = make_deck('Burn', {shock: 4, bolt: 2})
+        record_revision(deck)
+        InventoryItem.objects.create(card=shock, quantity=3)
+        self.path = os.path.join(settings.CARDS_DATA_DIR, 'snapshot.jsonl.gz')
+
+    def dump(self):
+        return {model._meta.model_name: list(model._default_manager.order_by('pk').values_list())
+                for model in SNAPSHOT_MODELS}
+
+    def indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' ORDER BY name")
+            return cursor.fetchall()
+
+    def test_round_trip(self):
+        before, indexes = self.dump(), self.indexes()
+        counts = export_snapshot(self.path)
+        self.assertEqual(counts, {name: len(rows) for name, rows in before.items()})
+
+        for model in reversed(SNAPSHOT_MODELS):
+            qs = model._default_manager.all()
+            qs._raw_delete(qs.db)
+        self.assertEqual(load_fixture(self.path), counts)
+        self.assertEqual(self.dump(), before)
+        self.assertEqual(self.indexes(), indexes)
+
+    def test_restore_refreshes_the_recommend_index(self):
+        export_snapshot(self.path)
+        other = make_deck('Shocks', {self.shock: 4})
+        recommend.refresh_decks([other.pk])
+        recommend.get_index().save()
+        self.assertEqual(set(recommend.get_index().vectors), {self.deck.pk, other.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            restore_snapshot(self.path, replace=True)
+        self.assertEqual(set(recommend.get_index().vectors), {self.deck.pk})
+        recommend._index = None  # otro proceso, o tras reiniciar
+        self.assertEqual(set(recommend.get_index().vectors), {self.deck.pk})
+
+        # sin replace se registran los decks restaurados
+        for model in reversed(SNAPSHOT_MODELS):
+            qs = model._default_manager.all()
+            qs._raw_delete(qs.db)
+        recommend.clear_index()
+        self.assertEqual(recommend.get_index().vectors, {})
+        with self.captureOnCommitCallbacks(execute=True):
+            restore_snapshot(self.path)
+        self.assertEqual(set(recommend.get_index().vectors), {self.deck.pk})
+
+    def test_archive_without_name_key(self):
+        export_snapshot(self.path)
+        before = self.dump()
+        with gzip.open(self.path, 'rt') as f:
+            lines = [json.loads(line) for line in f]
+        header = lines[1]
+        self.assertEqual(header['table'], 'card')
+        i = header['columns'].index('name_key')
+        for row in [header['columns']] + lines[2:2 + header['rows']]:
+            del row[i]
+        with gzip.open(self.path, 'wt') as f:
+            f.writelines(json.dumps(line) + '\n' for line in lines)
+
+        for model in reversed(SNAPSHOT_MODELS):
+            qs = model._default_manager.all()
+            qs._raw_delete(qs.db)
+        load_fixture(self.path)
+        self.assertEqual(self.dump(), before)
+
+    def test_clashing_ids_roll_back(self):
+        export_snapshot(self.path)
+        before, indexes = self.dump(), self.indexes()
+        with self.assertRaises(IntegrityError):
+            load_fixture(self.path)
+        self.assertEqual(self.dump(), before)
+        self.assertEqual(self.indexes(), indexes)
+
+
+def make_png(width=8, height=8, rgb=(200, 30, 30)):
+    """Valid PNG of one solid colour, written without Pillow."""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+    raw = (b'\x00' + bytes(rgb) * width) * height
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # /a.png y /b.png devuelven la misma imagen; /page.html no es una imagen
+    pages = {'/a.png': ('image/png', make_png(400, 560)),
+             '/b.png': ('image/png', make_png(400, 560)),
+             '/c.png': ('image/png', make_png(40, 56, rgb=(0, 0, 200))),
+             '/page.html': ('text/html', b'<html>not found</html>')}
+
+    def do_GET(self):
+        if self.path not in self.pages:
+            self.send_error(404)
+            return
+        content_type, body = self.pages[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class CardImageTests(DataDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base = f'http://127.0.0.1:{server.server_port}'
+
+        images._known, images._loaded_at = {}, None
+        self.addCleanup(setattr, images, '_loaded_at', None)
+        self.addCleanup(setattr, images, '_known', {})
+        images._touched.clear()
+
+        Card.objects.bulk_create(
+            [Card(name=name, image_url=f'{self.base}/{path}') for name, path in
+             [('A', 'a.png'), ('B', 'b.png'), ('C', 'c.png'),
+              ('Page', 'page.html'), ('Missing', 'missing.png')]]
+            + [Card(name='No image')])
+
+    def prefetch(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('prefetch_card_images', '--workers', '2', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_prefetch_and_serve(self):
+        out, err = self.prefetch()
+        self.assertIn('Fetched 3 images (0 already cached, 2 failed)', out)
+        self.assertIn('page.html did not return an image', err)
+        self.assertIn('missing.png: 404', err)
+
+        rows = dict(CardImage.objects.values_list('url', 'digest'))
+        a, b, c = (f'{self.base}/{name}.png' for name in 'abc')
+        self.assertEqual(set(rows), {a, b, c})
+        self.assertEqual(rows[a], rows[b])
+        self.assertNotEqual(rows[a], rows[c])
+        self.assertIn('Fetched 0 images (3 already cached, 2 failed)', self.prefetch()[0])
+
+        url = images.local_image_url(a)
+        self.assertEqual(url, images.local_image_url(b))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), _StubHandler.pages['/a.png'][1])
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['ETag'], f'"{rows[a]}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url.replace(rows[a], '0' * 64)).status_code, 404)
+
+        if images.Image is not None:
+            thumb = images.local_image_url(a, thumb=True)
+            self.assertIn('/thumbs/244x340/', thumb)
+            response = self.client.get(thumb)
+            self.assertEqual(response['Content-Type'], 'image/jpeg')
+            with images.Image.open(io.BytesIO(b''.join(response.streaming_content))) as img:
+                self.assertEqual(img.size, (243, 340))
+        else:
+            self.assertEqual(images.local_image_url(a, thumb=True), url)
+
+    def test_evict_least_recently_used(self):
+        self.prefetch()
+        a, c = f'{self.base}/a.png', f'{self.base}/c.png'
+        CardImage.objects.filter(url=c).update(last_used=CardImage.objects.get(url=a).last_used
+                                               + timezone.timedelta(seconds=1))
+        size_c = CardImage.objects.get(url=c).size
+
+        self.assertEqual(images.evict(size_c)[0], 1)  # a y b comparten fichero
+        self.assertEqual(set(CardImage.objects.values_list('url', flat=True)), {c})
+        self.assertIsNone(images.local_image_url(a))
+        self.assertIsNotNone(images.local_image_url(c))
+        self.assertEqual(images.evict(0), (1, size_c))
+        self.assertIsNone(images.local_image_url(c))
+        self.assertEqual(list(images.image_root().rglob('*.*')), [])
+
+    def test_misses_do_not_query_per_card(self):
+        self.prefetch()
+        images._known, images._loaded_at = {}, None
+        with self.assertNumQueries(1):
+            for path in ('a.png', 'page.html', 'missing.png', 'other.png'):
+                images.local_image_url(f'{self.base}/{path}')
+        with self.assertNumQueries(0):
+            self.assertIsNone(images.local_image_url(f'{self.base}/other.png'))
+            self.assertIsNotNone(images.local_image_url(f'{self.base}/a.png'))
+        images._loaded_at -= images.RELOAD_EVERY
+        with self.assertNumQueries(1):
+            self.assertIsNone(images.local_image_url(f'{self.base}/other.png'))
@@ -1,6 +1,18 @@
 from django.urls import path
 
+from . import views
 
-urlpatterns = [
 
+urlpatterns = [
+    path('compare/', views.deck_compare, name='deck_compare'),
+    path('buildable/', views.decks_buildable, name='decks_buildable'),
+    path('<int:pk>/similar/', views.deck_similar, name='deck_similar'),
+    path('<int:pk>/odds/', views.deck_odds_view, name='deck_odds'),
+    path('<int:pk>/revisions/<int:old>/diff/<int:new>/', views.deck_revision_diff,
+         name='deck_revision_diff'),
+    path('jobs/<int:pk>/progress/', views.job_progress, name='job_progress'),
+    path('cards/<int:pk>/co-played/', views.card_co_played, name='card_co_played'),
+    path('images/<slug:digest>.<slug:ext>', views.card_image, name='card_image'),
+    path('images/thumbs/<int:width>x<int:height>/<slug:digest>.jpg', views.card_thumb,
+         name='card_thumb'),
 ]
@@ -1,9 +1,19 @@
 from django.shortcuts import render
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from .models import Deck, Card
+from .models import Deck, Card, DeckRevision, Job
+from .analytics import deck_odds
+from .bulk import clear_deck, delete_all_decks, delete_cards
+from .catalog import card_names
+from .deck_diff import diff_decks, similarity_matrix
+from .history import diff_revisions
+from .images import CONTENT_TYPES, THUMB_SIZE, original_path, serve_image, thumb_path
+from .inventory import buildable_together, deck_buildability
+from .progress import stream_job_progress
+from .recommend import get_index
 import requests
-from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 import re
 
 
@@ -65,6 +75,11 @@ class PostDeleteAllView(DeleteView):
     template_name = "cards/deck_confirm_delete_all.html"
     success_url = reverse_lazy('post_list')  # Redirect after success
 
+    def form_valid(self, form):
+        # DELETE directo, sin cargar cada deck y sus cartas en memoria
+        delete_all_decks()
+        return HttpResponseRedirect(self.get_success_url())
+
 # delete all cards in a deck view
 
 
@@ -74,6 +89,11 @@ class PostDeleteAllCardsView(DeleteView):
     template_name = "cards/deck_confirm_delete_all_cards.html"
     success_url = reverse_lazy('post_list')  # Redirect after success
 
+    def form_valid(self, form):
+        # vacía el deck; el deck en sí no se borra
+        clear_deck(self.object.pk)
+        return HttpResponseRedirect(self.get_success_url())
+
 
 # delete single card in a deck view
 class PostDeleteCardView(DeleteView):
@@ -82,4 +102,141 @@ class PostDeleteCardView(DeleteView):
     template_name = "cards/deck_confirm_delete_card.html"
     success_url = reverse_lazy('post_list')  # Redirect after success
 
+    def form_valid(self, form):
+        delete_cards([self.object.pk])
+        return HttpResponseRedirect(self.get_success_url())
+
 # ? EXTRA
+
+
+# compare decks view
+def deck_compare(request):
+    """
+    Compares decks given as ?ids=1,2,...
+
+    - Two ids: returns the diff (added / removed / changed) from the first
+      deck to the second, plus their similarity.
+    - More ids: returns the all-pairs similarity matrix.
+    """
+    try:
+        ids = [int(i) for i in request.GET.get('ids', '').split(',') if i]
+    except ValueError:
+        return JsonResponse({'error': 'ids must be integers'}, status=400)
+    if len(ids) < 2:
+        return JsonResponse({'error': 'at least two deck ids are required'}, status=400)
+
+    if len(ids) == 2:
+        diff = diff_decks(ids[0], ids[1])
+        return JsonResponse({
+            'decks': ids,
+            # claves JSON como str; changed -> [old, new]
+            'added': {str(c): q for c, q in diff['added'].items()},
+            'removed': {str(c): q for c, q in diff['removed'].items()},
+            'changed': {str(c): list(q) for c, q in diff['changed'].items()},
+            'similarity': diff['similarity'],
+        })
+
+    deck_ids, matrix = similarity_matrix(ids)
+    return JsonResponse({'decks': deck_ids, 'similarity': matrix})
+
+
+def _top_k(request, default=10, limit=100):
+    """?k= as an int between 1 and `limit`, or None if it is not a number."""
+    try:
+        return max(1, min(int(request.GET.get('k', default)), limit))
+    except ValueError:
+        return None
+
+
+# similar decks view
+def deck_similar(request, pk):
+    """Returns the decks most similar to deck `pk` (?k=10)."""
+    k = _top_k(request)
+    if k is None:
+        return JsonResponse({'error': 'k must be an integer'}, status=400)
+    results = get_index().similar_decks(pk, k)
+    return JsonResponse({'deck': pk, 'similar': [
+        {'deck': deck_id, 'score': score} for deck_id, score in results]})
+
+
+# cards often played with view
+def card_co_played(request, pk):
+    """Returns the cards that most often share a deck with card `pk` (?k=10)."""
+    k = _top_k(request)
+    if k is None:
+        return JsonResponse({'error': 'k must be an integer'}, status=400)
+    results = get_index().co_played(pk, k)
+    names = card_names(card_id for card_id, _count in results)
+    return JsonResponse({'card': pk, 'co_played': [
+        {'card': card_id, 'name': names.get(card_id), 'decks': count}
+        for card_id, count in results]})
+
+
+# deck revision diff view
+def deck_revision_diff(request, pk, old, new):
+    """Returns the changes in deck `pk` from revision `old` to revision `new`."""
+    try:
+        diff = diff_revisions(pk, old, new)
+    except DeckRevision.DoesNotExist as e:
+        return JsonResponse({'error': str(e)}, status=404)
+    return JsonResponse({
+        'deck': pk,
+        'from': old,
+        'to': new,
+        'added': {str(c): q for c, q in diff['added'].items()},
+        'removed': {str(c): q for c, q in diff['removed'].items()},
+        'changed': {str(c): list(q) for c, q in diff['changed'].items()},
+    })
+
+
+# deck odds view
+def deck_odds_view(request, pk):
+    """Returns exact draw odds and goldfish results for deck `pk`."""
+    return JsonResponse({'deck': pk, **deck_odds(pk)})
+
+
+# buildable decks view
+def decks_buildable(request):
+    """
+    Missing copies per deck given the inventory, plus the decks that can be
+    sleeved up at the same time sharing it.
+    """
+    decks = deck_buildability()
+    return JsonResponse({
+        'decks': [{'deck': d.pk, 'title': d.title, 'total_cards': d.total_cards,
+                   'missing': d.missing} for d in decks],
+        'buildable_together': buildable_together(),
+    })
+
+
+# job progress stream view
+async def job_progress(request, pk):
+    """
+    Streams the progress of job `pk` as Server-Sent Events until it
+    finishes (see cards.progress). Meant to be served through ASGI
+    (_core/asgi.py): under WSGI the whole stream is buffered.
+    """
+    if not await Job.objects.filter(pk=pk).aexists():
+        raise Http404(f"No job {pk}")
+    return StreamingHttpResponse(
+        stream_job_progress(pk), content_type='text/event-stream',
+        # sin caché ni buffering en nginx: cada evento sale en cuanto se genera
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# cached card image views
+@require_safe
+def card_image(request, digest, ext):
+    """Serves a card image from the local cache (see cards.images)."""
+    if ext not in CONTENT_TYPES:
+        raise Http404("Unknown image type")
+    return serve_image(request, original_path(digest, ext), digest, digest, CONTENT_TYPES[ext])
+
+
+@require_safe
+def card_thumb(request, width, height, digest):
+    """Serves the grid thumbnail of a cached card image."""
+    if (width, height) != THUMB_SIZE:
+        raise Http404("Unknown thumbnail size")
+    return serve_image(request, thumb_path(digest), digest,
+                       f'{digest}-{width}x{height}', 'image/jpeg')
@@ -1,6 +1,8 @@
 from django import template
 import re
 
+from cards.images import local_image_url
+
 register = template.Library()
 
 @register.filter
@@ -84,4 +86,27 @@ def widthratio(value, max_value, scale):
     try:
         return int((float(value) / float(max_value)) * float(scale))
     except (ValueError, ZeroDivisionError):
-        return 0
\ No newline at end of file
+        return 0
+
+def _image_url(card):
+    # dict de la API (imageUrl) o modelo Card (image_url)
+    if isinstance(card, dict):
+        return card.get('imageUrl') or card.get('image_url')
+    return getattr(card, 'image_url', None) or getattr(card, 'imageUrl', None)
+
+@register.filter
+def card_image(card):
+    """
+    Card image from the local cache (see manage.py prefetch_card_images),
+    or its remote URL if it has not been downloaded
+    """
+    url = _image_url(card)
+    return local_image_url(url) or url
+
+@register.filter
+def card_thumb(card):
+    """
+    Grid-size thumbnail of a card image from the local cache, or its remote URL
+    """
+    url = _image_url(card)
+    return local_image_url(url, thumb=True) or url